@@ -0,0 +1,242 @@
+import os
+import random
+import struct
+import argparse
+
+import numpy as np
+
+import connect_four as cf
+import bitboard as bb
+
+# Archive layout: a fixed header, then the games back to back. Each move is one byte holding its column;
+# each game ends with one byte END_FLAG | result code. The file is append-only.
+HEADER = struct.Struct("<4sHBB8x")
+MAGIC = b"C4GA"
+VERSION = 1
+END_FLAG = 0x80
+UNFINISHED = 2  # result of a game that stopped before a win or a full board
+RESULT_CODES = {-1: 0, 0: 1, 1: 2, UNFINISHED: 3}  # result (PLAYER1's point of view) -> end byte code
+CODE_RESULTS = np.array([-1, 0, 1, UNFINISHED], dtype=np.int8)
+CHUNK = 1 << 20
+
+# Index files next to the archive: one row per game, and the position keys of every (game, ply) sorted
+# by key, with the matching (game, ply) rows in a parallel file so key lookups stay a binary search
+GAME_DTYPE = np.dtype([("offset", "<u8"), ("length", "u1"), ("result", "i1")])
+OCCURRENCE_DTYPE = np.dtype([("game", "<u4"), ("ply", "u1")])
+START_KEY = sum(1 << (col * bb.H1) for col in range(cf.COLUMNS))  # position_key of the empty board
+
+
+def game_result(moves):
+	"""
+	Returns the result of a move sequence (1, 0 or -1 for PLAYER1, or UNFINISHED); raises ValueError
+	for an illegal sequence or moves after the game ended.
+	"""
+	current = mask = 0
+	for ply, col in enumerate(moves):
+		if not 0 <= col < cf.COLUMNS or not bb.can_play(mask, col):
+			raise ValueError(f"Illegal move {col} at ply {ply}")
+		if bb.is_winning_move(current, mask, col):
+			if ply != len(moves) - 1:
+				raise ValueError(f"Moves after the game ended at ply {ply}")
+			return 1 if ply % 2 == 0 else -1
+		current, mask = bb.play(current, mask, col)
+	return 0 if len(moves) == bb.CELLS else UNFINISHED
+
+
+class GameArchive:
+	"""
+	An append-only file of game records (one byte per move) with a memory-mapped index from
+	position key (cf.position_key) to the games and plies where the position occurred.
+	"""
+
+	def __init__(self, path):
+		self.path = path
+		if not os.path.exists(path) or os.path.getsize(path) == 0:
+			with open(path, "wb") as f:
+				f.write(HEADER.pack(MAGIC, VERSION, cf.ROWS, cf.COLUMNS))
+		with open(path, "rb") as f:
+			magic, version, rows, columns = HEADER.unpack(f.read(HEADER.size))
+		if magic != MAGIC or version != VERSION or (rows, columns) != (cf.ROWS, cf.COLUMNS):
+			raise ValueError(f"{path} is not a version {VERSION} {cf.ROWS}x{cf.COLUMNS} game archive")
+		self.truncate_torn_game()
+
+	def truncate_torn_game(self):
+		"""Drop a trailing game without an end byte (left by an interrupted append)"""
+		data = self.data()
+		size = 0
+		for end in range(len(data), 0, -CHUNK):
+			start = max(end - CHUNK, 0)
+			ends = np.flatnonzero(data[start:end] & END_FLAG)
+			if len(ends):
+				size = start + int(ends[-1]) + 1
+				break
+		del data
+		if os.path.getsize(self.path) != HEADER.size + size:
+			with open(self.path, "r+b") as f:
+				f.truncate(HEADER.size + size)
+
+	def data(self):
+		"""Returns the game bytes as a read-only memory map (an empty array for an empty archive)."""
+		if os.path.getsize(self.path) == HEADER.size:
+			return np.zeros(0, dtype=np.uint8)
+		return np.memmap(self.path, dtype=np.uint8, mode="r", offset=HEADER.size)
+
+	@staticmethod
+	def encode(moves):
+		return bytes(moves) + bytes([END_FLAG | RESULT_CODES[game_result(moves)]])
+
+	def append(self, moves):
+		"""Append one game given as its sequence of columns."""
+		self.extend([moves])
+
+	def extend(self, games):
+		"""Append many games (sequences of columns) with a single write."""
+		buffer = b"".join(self.encode(list(moves)) for moves in games)
+		with open(self.path, "ab") as f:
+			f.write(buffer)
+
+	def __iter__(self):
+		"""Streams (moves, result) for every game; moves is a bytes object of columns."""
+		data = self.data()
+		start = 0
+		for chunk_start in range(0, len(data), CHUNK):
+			chunk = data[chunk_start:chunk_start + CHUNK]
+			for end in (np.flatnonzero(chunk & END_FLAG) + chunk_start).tolist():
+				yield bytes(data[start:end]), int(CODE_RESULTS[data[end] & (0xFF ^ END_FLAG)])
+				start = end + 1
+
+	def __len__(self):
+		data = self.data()
+		return sum(int(np.count_nonzero(data[i:i + CHUNK] & END_FLAG)) for i in range(0, len(data), CHUNK))
+
+	def index_paths(self):
+		return self.path + ".games.npy", self.path + ".keys.npy", self.path + ".occurrences.npy"
+
+	def build_index(self):
+		"""
+		(Re)build the game table and the sorted position index for every game in the archive.
+		Returns the number of indexed positions.
+		"""
+		data = np.asarray(self.data())
+		ends = np.flatnonzero(data & END_FLAG)
+		starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64)
+		lengths = ends - starts
+		n = len(ends)
+		games = np.empty(n, dtype=GAME_DTYPE)
+		games["offset"] = starts
+		games["length"] = lengths
+		games["result"] = CODE_RESULTS[data[ends] & (0xFF ^ END_FLAG)]
+
+		# Replay all games at once, one ply per step; the key of a position is recorded before each move
+		total = int(lengths.sum()) + n
+		position_keys = np.empty(total, dtype=np.uint64)
+		occurrences = np.empty(total, dtype=OCCURRENCE_DTYPE)
+		keys = np.full(n, START_KEY, dtype=np.uint64)
+		heights = np.zeros((n, cf.COLUMNS), dtype=np.int64)
+		game_ids = np.arange(n)
+		filled = 0
+		for ply in range(int(lengths.max()) + 1 if n else 0):
+			active = game_ids[lengths >= ply]
+			count = len(active)
+			position_keys[filled:filled + count] = keys[active]
+			occurrences["game"][filled:filled + count] = active
+			occurrences["ply"][filled:filled + count] = ply
+			filled += count
+			active = game_ids[lengths > ply]
+			cols = data[starts[active] + ply].astype(np.int64)
+			bits = cols * bb.H1 + heights[active, cols] + (1 if ply % 2 == 0 else 0)
+			# the column's marker bit moves up one cell; a PLAYER1 piece also keeps a bit where it lands
+			keys[active] += np.left_shift(np.uint64(1), bits.astype(np.uint64))
+			heights[active, cols] += 1
+		order = np.argsort(position_keys, kind="stable")
+
+		games_path, keys_path, occurrences_path = self.index_paths()
+		np.save(games_path, games)
+		np.save(keys_path, position_keys[order])
+		np.save(occurrences_path, occurrences[order])
+		return total
+
+	def load_index(self):
+		"""Returns the (games, keys, occurrences) index arrays, memory-mapped."""
+		return tuple(np.load(path, mmap_mode="r") for path in self.index_paths())
+
+	def occurrences(self, position):
+		"""
+		Returns (games, plies) arrays of every indexed game reaching the position (a board or a position key).
+		"""
+		key = cf.position_key(position) if isinstance(position, list) else position
+		_, keys, occurrences = self.load_index()
+		lo = np.searchsorted(keys, np.uint64(key), side="left")
+		hi = np.searchsorted(keys, np.uint64(key), side="right")
+		found = np.asarray(occurrences[lo:hi])
+		return found["game"], found["ply"]
+
+	def stats(self, position):
+		"""
+		Returns how the indexed games reaching the position ended:
+		{"games", "player1_wins", "player2_wins", "draws", "unfinished"}.
+		"""
+		games = self.load_index()[0]
+		game_ids, _ = self.occurrences(position)
+		results = np.asarray(games["result"][np.sort(game_ids)])
+		return {
+			"games": len(results),
+			"player1_wins": int(np.count_nonzero(results == 1)),
+			"player2_wins": int(np.count_nonzero(results == -1)),
+			"draws": int(np.count_nonzero(results == 0)),
+			"unfinished": int(np.count_nonzero(results == UNFINISHED)),
+		}
+
+	def game(self, index):
+		"""Returns the moves (bytes) and result of game number index, using the index."""
+		offset, length, result = self.load_index()[0][index]
+		return bytes(self.data()[offset:offset + length]), int(result)
+
+
+def random_game(rng):
+	"""Returns the columns of a game of uniformly random legal moves."""
+	current = mask = 0
+	moves = []
+	while len(moves) < bb.CELLS:
+		col = rng.choice(bb.legal_columns(mask))
+		moves.append(col)
+		if bb.is_winning_move(current, mask, col):
+			break
+		current, mask = bb.play(current, mask, col)
+	return moves
+
+
+def main():
+	import time
+	parser = argparse.ArgumentParser(description="Game record archive with a position index")
+	parser.add_argument("archive")
+	parser.add_argument("--add-random", type=int, default=0, metavar="N", help="append N random games")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--index", action="store_true", help="rebuild the position index")
+	parser.add_argument("--query", metavar="MOVES", help="report results of games reaching this position")
+	args = parser.parse_args()
+
+	archive = GameArchive(args.archive)
+	if args.add_random:
+		rng = random.Random(args.seed)
+		start = time.perf_counter()
+		remaining = args.add_random
+		while remaining:
+			batch = min(remaining, 10000)
+			archive.extend(random_game(rng) for _ in range(batch))
+			remaining -= batch
+		print(f"appended in {time.perf_counter() - start:.2f}s")
+	if args.index:
+		start = time.perf_counter()
+		count = archive.build_index()
+		print(f"indexed {count:,} positions in {time.perf_counter() - start:.2f}s")
+	if args.query is not None:
+		start = time.perf_counter()
+		stats = archive.stats(cf.board_from_moves(args.query))
+		elapsed = time.perf_counter() - start
+		print(", ".join(f"{name} {value:,}" for name, value in stats.items()) + f"  ({elapsed * 1000:.2f} ms)")
+	print(f"{args.archive}: {len(archive):,} games, {os.path.getsize(args.archive):,} bytes")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import connect_four as cf
+
+IPC_GRACE = 0.02  # seconds of each search's share of a batch budget kept back for pool round trips
+
+
+def init_worker():
+	"""Silence the per-action search trace in pool workers"""
+	sys.stdout = open(os.devnull, "w")
+
+
+def search(board, difficulty=None, time_limit=None):
+	"""Run a minimax search and return (score, move, depth, positions, seconds)"""
+	start = time.perf_counter()
+	res = cf.minimax(board, difficulty, time_limit=time_limit)
+	return res[0][0], res[0][1], res[1], res[2], time.perf_counter() - start
+
+
+def canonical(board):
+	"""
+	Returns (key, mirrored) where key is identical for a position and its left-right reflection.
+	"""
+	key = tuple("".join(row) for row in board)
+	mirrored_key = tuple(row[::-1] for row in key)
+	if mirrored_key < key:
+		return mirrored_key, True
+	return key, False
+
+
+def mirror_move(move):
+	return None if move is None else (move[0], cf.COLUMNS - 1 - move[1])
+
+
+class BatchSearcher:
+	"""
+	Schedules minimax searches for many boards across a process pool.
+	Identical and mirrored positions within a batch are searched once, and finished
+	results are kept in a cache shared by every later batch.
+	"""
+
+	def __init__(self, workers=None, cache_size=100000):
+		self.workers = workers or os.cpu_count() or 1
+		self.cache_size = cache_size
+		self.cache = {}
+		self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+
+	def close(self, wait=True):
+		self.pool.shutdown(wait=wait, cancel_futures=True)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def best_moves(self, boards, budget=None):
+		"""
+		Returns one stats dict per board, in order: move, score, depth, positions, seconds,
+		cached, mirrored and timed_out. With a budget (seconds for the whole batch) each search gets an
+		equal share of the workers' time and deepens until it runs out; boards still unfinished at the end
+		get cf.fallback_move. Only unbudgeted results are kept for later batches.
+		"""
+		deadline = None if budget is None else time.monotonic() + budget
+		keys = [canonical(board) for board in boards]
+
+		jobs = {}
+		for board, (key, mirrored) in zip(boards, keys):
+			if key not in self.cache and key not in jobs:
+				jobs[key] = cf.mirror(board) if mirrored else board
+		time_limit = None
+		if deadline is not None and jobs:
+			share = max(deadline - time.monotonic(), 0) * min(self.workers, len(jobs)) / len(jobs)
+			time_limit = max(share - IPC_GRACE, 0.001)
+		futures = {self.pool.submit(search, board, None, time_limit): key for key, board in jobs.items()}
+
+		found = {}
+		pending = set(futures)
+		while pending:
+			timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+			done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+			if not done:
+				break
+			for future in done:
+				found[futures[future]] = future.result()
+				if time_limit is None:
+					self.store(futures[future], found[futures[future]])
+		for future in pending:
+			future.cancel()
+
+		fresh = set(found)
+		results = []
+		for board, (key, mirrored) in zip(boards, keys):
+			entry = found.get(key, self.cache.get(key))
+			if entry is None:
+				results.append({
+					"move": cf.fallback_move(board), "score": None, "depth": 0, "positions": 0,
+					"seconds": 0.0, "cached": False, "mirrored": mirrored, "timed_out": True
+				})
+				continue
+			score, move, depth, positions, seconds = entry
+			results.append({
+				"move": mirror_move(move) if mirrored else move, "score": score, "depth": depth,
+				"positions": positions, "seconds": seconds, "cached": key not in fresh,
+				"mirrored": mirrored, "timed_out": False
+			})
+			fresh.discard(key)  # later duplicates in the same batch count as cache hits
+		return results
+
+	def store(self, key, entry):
+		if len(self.cache) >= self.cache_size:
+			self.cache.pop(next(iter(self.cache)))
+		self.cache[key] = entry
+
+
+def best_moves(boards, budget=None, workers=None):
+	"""
+	Returns per-board stats dicts (see BatchSearcher.best_moves) using a temporary pool.
+	"""
+	searcher = BatchSearcher(workers)
+	try:
+		return searcher.best_moves(boards, budget)
+	finally:
+		searcher.close(wait=False)  # don't wait for searches still finishing after the budget
+
+
+def random_position(plies):
+	"""Returns a non-terminal board reached by random legal play."""
+	while True:
+		board = cf.initial_state()
+		for _ in range(plies):
+			board = cf.result(board, random.choice(sorted(cf.actions(board))))
+			if cf.terminal(board):
+				break
+		else:
+			return board
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Measure batched best-move throughput")
+	parser.add_argument("--boards", type=int, default=32, help="batch size")
+	parser.add_argument("--plies", type=int, default=8, help="random plies played to build each board")
+	parser.add_argument("--workers", default="1", help="comma-separated worker counts to compare")
+	parser.add_argument("--seed", type=int, default=1)
+	args = parser.parse_args()
+
+	random.seed(args.seed)
+	boards = [random_position(args.plies) for _ in range(args.boards)]
+	for workers in (int(w) for w in args.workers.split(",")):
+		with BatchSearcher(workers) as searcher:
+			start = time.perf_counter()
+			results = searcher.best_moves(boards)
+			elapsed = time.perf_counter() - start
+		positions = sum(r["positions"] for r in results if not r["cached"])
+		unique = sum(1 for r in results if not r["cached"])
+		print(f"workers={workers} boards={len(boards)} unique={unique} "
+			f"time={elapsed:.2f}s positions/s={positions / elapsed:,.0f}")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,243 @@
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import contextlib
+
+import connect_four as cf
+
+# Benchmark corpus. Positions are column sequences (0-6) played from the empty board; "expect" lists
+# the moves (columns) known to be correct, or None when any move will do; "loss" marks solved losses
+# for the side to move, where the search must report the proven loss. Expected moves and losses were
+# proven with an exhaustive search: forced wins within the stated number of plies, the only move that
+# stops an immediate loss, and solved endgames.
+CORPUS = [
+	{"name": "empty", "group": "opening", "moves": "", "expect": [3]},
+	{"name": "centre-reply", "group": "opening", "moves": "3", "expect": None},
+	{"name": "centre-stack", "group": "opening", "moves": "33", "expect": None},
+	{"name": "side-opening", "group": "opening", "moves": "3234", "expect": None},
+	{"name": "block-1", "group": "midgame", "moves": "35352361636", "expect": [6]},
+	{"name": "block-2", "group": "midgame", "moves": "0434631214", "expect": [4]},
+	{"name": "block-3", "group": "midgame", "moves": "0304454145244011", "expect": [6]},
+	{"name": "mid-open", "group": "midgame", "moves": "3324452106", "expect": None},
+	{"name": "mid-centre", "group": "midgame", "moves": "2346330524", "expect": None},
+	{"name": "win-in-3-a", "group": "forced-win", "moves": "21641511554153", "expect": [3]},
+	{"name": "win-in-3-b", "group": "forced-win", "moves": "40155511130634", "expect": [2]},
+	{"name": "win-in-3-c", "group": "forced-win", "moves": "206426165332", "expect": [1, 4]},
+	{"name": "win-in-3-d", "group": "forced-win", "moves": "353543535466", "expect": [2]},
+	{"name": "win-in-5-a", "group": "forced-win", "moves": "0103244011611661456", "expect": [2]},
+	{"name": "win-in-5-b", "group": "forced-win", "moves": "60565530315410563304", "expect": [4]},
+	{"name": "end-win", "group": "endgame", "moves": "140363653063035305114026116640", "expect": [4]},
+	{"name": "end-loss-a", "group": "endgame", "moves": "55533443301005301264454314520", "expect": None, "loss": True},
+	{"name": "end-loss-b", "group": "endgame", "moves": "43531041021320211564402156622664", "expect": None, "loss": True},
+	{"name": "end-loss-c", "group": "endgame", "moves": "14056122201053266631001242514", "expect": None, "loss": True},
+]
+
+
+def is_correct(entry, board, score, move):
+	"""
+	Returns whether a search result matches the entry's known result (None if there is nothing to check).
+	A proven loss scores at most -(WIN_SCORE - 42) for the side to move (PLAYER1's point of view otherwise).
+	"""
+	if entry.get("loss"):
+		sign = 1 if cf.player(board) == cf.PLAYER1 else -1
+		return sign * score <= -(cf.WIN_SCORE - cf.ROWS * cf.COLUMNS)
+	if entry["expect"] is None:
+		return None
+	return move is not None and move[1] in entry["expect"]
+
+
+def run_minimax(board):
+	return cf.minimax(board)
+
+
+def run_minimax_linear(board):
+	from evaluator import LinearEvaluator
+	return cf.minimax(board, evaluator=LinearEvaluator())
+
+
+def run_mcts(board):
+	import mcts
+	return mcts.mcts(board, time_limit=1.0, engine=mcts.MCTS(seed=0))
+
+
+def run_bitboard(board):
+	import kernels
+	return kernels.search(board)
+
+
+def run_bitboard_python(board):
+	import kernels
+	return kernels.search(board, module=kernels.pure_kernels())
+
+
+def warm_up_bitboard():
+	import kernels
+	kernels.warm_up()
+
+
+ENGINES = {
+	"minimax": run_minimax,
+	"minimax-linear": run_minimax_linear,
+	"mcts": run_mcts,
+	"bitboard": run_bitboard,
+	"bitboard-py": run_bitboard_python,
+}
+
+# Called before an engine's first timed position (e.g. to JIT-compile it)
+SETUP = {
+	"bitboard": warm_up_bitboard,
+}
+
+
+def bench_position(engine, entry, repeat=1):
+	"""
+	Returns the measurements for one engine on one corpus entry (the fastest of repeat runs).
+	"""
+	board = cf.board_from_moves(entry["moves"])
+	best = None
+	for _ in range(repeat):
+		with contextlib.redirect_stdout(io.StringIO()):
+			start = time.perf_counter()
+			(score, move), depth, nodes = engine(board)
+			seconds = time.perf_counter() - start
+		if best is None or seconds < best["seconds"]:
+			best = {
+				"group": entry["group"],
+				"move": move[1] if move else None,
+				"score": score,
+				"depth": depth,
+				"nodes": nodes,
+				"seconds": seconds,
+				"nps": nodes / seconds if seconds > 0 else 0.0,
+				"correct": is_correct(entry, board, score, move),
+			}
+	return best
+
+
+def run(engines, groups=None, repeat=1, verbose=True):
+	"""
+	Benchmarks each named engine on the corpus and returns the results as a JSON-ready dict.
+	"""
+	results = {"python": platform.python_version(), "engines": {}}
+	for name in engines:
+		if name in SETUP:
+			SETUP[name]()
+		positions = {}
+		for entry in CORPUS:
+			if groups and entry["group"] not in groups:
+				continue
+			res = bench_position(ENGINES[name], entry, repeat)
+			positions[entry["name"]] = res
+			if verbose:
+				correct = {None: "", True: "ok", False: "WRONG"}[res["correct"]]
+				print(f"{name:<15}{entry['name']:<15}{res['group']:<11}depth {res['depth']:>3}  "
+					f"nodes {res['nodes']:>9,}  {res['seconds']:8.3f}s  {res['nps']:>10,.0f} n/s  {correct}")
+		checked = [p["correct"] for p in positions.values() if p["correct"] is not None]
+		seconds = sum(p["seconds"] for p in positions.values())
+		nodes = sum(p["nodes"] for p in positions.values())
+		results["engines"][name] = {
+			"positions": positions,
+			"total": {
+				"nodes": nodes,
+				"seconds": seconds,
+				"nps": nodes / seconds if seconds > 0 else 0.0,
+				"correct": sum(checked),
+				"checked": len(checked),
+			},
+		}
+		if verbose:
+			total = results["engines"][name]["total"]
+			print(f"{name:<15}{'TOTAL':<26}nodes {nodes:>9,}  {seconds:8.3f}s  {total['nps']:>10,.0f} n/s  "
+				f"{total['correct']}/{total['checked']} correct")
+	if "bitboard" in engines and "bitboard-py" in engines:
+		results["jit"] = jit_report(results, verbose)
+	return results
+
+
+def jit_report(results, verbose=True):
+	"""
+	Returns {"numba", "speedup", "mismatches"} comparing the compiled and the pure-Python bitboard kernels,
+	which must find the same move, score and node count on every position.
+	"""
+	import kernels
+	compiled, pure = results["engines"]["bitboard"], results["engines"]["bitboard-py"]
+	mismatches = [
+		name for name, res in compiled["positions"].items()
+		if any(res[field] != pure["positions"][name][field] for field in ("move", "score", "nodes"))
+	]
+	speedup = pure["total"]["seconds"] / compiled["total"]["seconds"] if compiled["total"]["seconds"] > 0 else 0.0
+	if verbose:
+		print(f"bitboard kernels: {'numba' if kernels.JIT else 'pure Python (numba not available)'}, "
+			f"{speedup:.1f}x the pure-Python speed, "
+			+ (f"MISMATCH on {', '.join(mismatches)}" if mismatches else "identical results"))
+	return {"numba": kernels.JIT, "speedup": speedup, "mismatches": mismatches}
+
+
+def compare(baseline, current, threshold=0.2, min_seconds=0.01):
+	"""
+	Returns a list of regression messages: positions that became slower, searched more nodes or
+	lost a known result by more than threshold (a fraction) relative to the baseline.
+	"""
+	regressions = []
+	for name, engine in current["engines"].items():
+		base_engine = baseline["engines"].get(name)
+		if base_engine is None:
+			continue
+		for pos, res in engine["positions"].items():
+			base = base_engine["positions"].get(pos)
+			if base is None:
+				continue
+			if max(res["seconds"], base["seconds"]) >= min_seconds and res["seconds"] > base["seconds"] * (1 + threshold):
+				regressions.append(f"{name}/{pos}: time {base['seconds']:.3f}s -> {res['seconds']:.3f}s")
+			if res["nodes"] > base["nodes"] * (1 + threshold):
+				regressions.append(f"{name}/{pos}: nodes {base['nodes']:,} -> {res['nodes']:,}")
+			if base["correct"] and not res["correct"]:
+				regressions.append(f"{name}/{pos}: known result no longer found (move {res['move']})")
+		base_nps, nps = base_engine["total"]["nps"], engine["total"]["nps"]
+		if nps < base_nps * (1 - threshold):
+			regressions.append(f"{name}: nodes/second {base_nps:,.0f} -> {nps:,.0f}")
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark search engines on a fixed position corpus")
+	parser.add_argument("--engines", default="minimax", help=f"comma-separated, from {', '.join(ENGINES)}")
+	parser.add_argument("--groups", default=None, help="comma-separated groups (opening, midgame, endgame, forced-win)")
+	parser.add_argument("--repeat", type=int, default=1, help="runs per position (the fastest is kept)")
+	parser.add_argument("--save", metavar="FILE", help="write the results as a JSON baseline")
+	parser.add_argument("--compare", metavar="FILE", help="compare against a JSON baseline and flag regressions")
+	parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown/node increase (fraction)")
+	parser.add_argument("--profile", metavar="PREFIX", help="profile the run and write PREFIX.pstats / PREFIX.collapsed")
+	args = parser.parse_args()
+
+	engines = args.engines.split(",")
+	for name in engines:
+		if name not in ENGINES:
+			parser.error(f"unknown engine {name!r}")
+	groups = args.groups.split(",") if args.groups else None
+	if args.profile:
+		from profiling import profile_call
+		results = profile_call(run, engines, groups, args.repeat, output=args.profile, quiet=False)
+	else:
+		results = run(engines, groups, args.repeat)
+
+	if args.save:
+		with open(args.save, "w") as f:
+			json.dump(results, f, indent=2)
+	if args.compare:
+		with open(args.compare) as f:
+			regressions = compare(json.load(f), results, args.threshold)
+		for message in regressions:
+			print("REGRESSION", message)
+		if regressions:
+			sys.exit(1)
+		print("no regressions")
+	if results.get("jit", {}).get("mismatches"):
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,127 @@
+import connect_four as cf
+
+# Bitboard representation of a position. Each column uses ROWS + 1 bits: the bottom cell is the
+# lowest bit and the extra bit is a sentinel that stops lines wrapping into the next column.
+# A position is (current, mask): the stones of the player to move and all stones on the board.
+
+H1 = cf.ROWS + 1
+BOTTOM_MASK = sum(1 << (col * H1) for col in range(cf.COLUMNS))
+BOARD_MASK = BOTTOM_MASK * ((1 << cf.ROWS) - 1)
+CELLS = cf.ROWS * cf.COLUMNS
+
+
+def bottom_mask(col):
+	return 1 << (col * H1)
+
+
+def top_mask(col):
+	return 1 << (cf.ROWS - 1 + col * H1)
+
+
+def column_mask(col):
+	return ((1 << cf.ROWS) - 1) << (col * H1)
+
+
+def from_board(board):
+	"""
+	Returns (current, mask, moves) for a list-of-lists board.
+	"""
+	to_move = cf.player(board) or cf.PLAYER1
+	current = mask = moves = 0
+	for col in range(cf.COLUMNS):
+		for height, row in enumerate(range(cf.ROWS - 1, -1, -1)):
+			cell = board[row][col]
+			if cell == cf.EMPTY:
+				break
+			bit = 1 << (col * H1 + height)
+			mask |= bit
+			moves += 1
+			if cell == to_move:
+				current |= bit
+	return current, mask, moves
+
+
+def to_board(current, mask, moves):
+	"""
+	Returns the list-of-lists board for a bitboard position.
+	"""
+	to_move, other = (cf.PLAYER1, cf.PLAYER2) if moves % 2 == 0 else (cf.PLAYER2, cf.PLAYER1)
+	board = cf.initial_state()
+	for col in range(cf.COLUMNS):
+		for height in range(cf.ROWS):
+			bit = 1 << (col * H1 + height)
+			if mask & bit:
+				board[cf.ROWS - 1 - height][col] = to_move if current & bit else other
+	return board
+
+
+def key(current, mask):
+	"""
+	Returns a unique integer key for the position (from the side to move's point of view).
+	"""
+	return current + mask + BOTTOM_MASK
+
+
+def can_play(mask, col):
+	return mask & top_mask(col) == 0
+
+
+def legal_columns(mask):
+	return [col for col in range(cf.COLUMNS) if mask & top_mask(col) == 0]
+
+
+def play(current, mask, col):
+	"""
+	Returns the position after the side to move drops a piece in col (the opponent is then to move).
+	"""
+	return current ^ mask, mask | (mask + bottom_mask(col))
+
+
+def row_of(mask, col):
+	"""
+	Returns the board row (0 = top) a piece dropped in col lands on.
+	"""
+	height = ((mask >> (col * H1)) & ((1 << cf.ROWS) - 1)).bit_length()
+	return cf.ROWS - 1 - height
+
+
+def alignment(pos):
+	"""
+	Returns True if the stones in pos contain four in a row.
+	"""
+	for shift in (1, H1, H1 - 1, H1 + 1):
+		m = pos & (pos >> shift)
+		if m & (m >> (2 * shift)):
+			return True
+	return False
+
+
+def is_winning_move(current, mask, col):
+	"""
+	Returns True if the side to move wins by playing col.
+	"""
+	pos = current | ((mask + bottom_mask(col)) & column_mask(col))
+	return alignment(pos)
+
+
+def winning_cells(pos, mask):
+	"""
+	Returns a mask of empty cells that would complete four in a row for the stones in pos.
+	"""
+	# vertical
+	r = (pos << 1) & (pos << 2) & (pos << 3)
+	for shift in (H1, H1 - 1, H1 + 1):
+		p = (pos << shift) & (pos << (2 * shift))
+		r |= p & (pos << (3 * shift))
+		r |= p & (pos >> shift)
+		p = (pos >> shift) & (pos >> (2 * shift))
+		r |= p & (pos << shift)
+		r |= p & (pos >> (3 * shift))
+	return r & (BOARD_MASK ^ mask)
+
+
+def possible(mask):
+	"""
+	Returns a mask of the cells where a piece can be dropped.
+	"""
+	return (mask + BOTTOM_MASK) & BOARD_MASK
@@ -1,7 +1,10 @@
 
+import os
+import json
 import math
+import time
+import random
 import utils
-import cProfile
 
 PLAYER1 = 'R'
 PLAYER2 = 'Y'
@@ -9,13 +12,46 @@ EMPTY = ' '
 ROWS = 6
 COLUMNS = 7
 MIN_DEPTH = 5
+WIN_SCORE = 10000  # a win n plies from the root scores WIN_SCORE - n, so faster wins score higher
+THREAT_SCORE = 1000  # heuristic score of a position with an immediate threat above the last move
+STATIC_MIN_DEPTH = 2  # nodes with at least this much depth left run the static threat analysis first
+
+# Weights of the heuristic() terms; a weights.json next to this module (written by tune.py) replaces them
+HEURISTIC_WEIGHTS = {"open_three": 30, "three": 20, "two": 10, "position_base": -8}
+WEIGHTS_FILE = os.environ.get("CONNECT_FOUR_WEIGHTS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.json"))
+
+# Difficulty profiles: node budget, time budget (seconds) and evaluation noise (std. dev. added to heuristic scores).
+# A profile without budgets runs the classic fixed-depth search.
+DIFFICULTIES = {
+	"easy": {"nodes": 2000, "time": 0.25, "noise": 40},
+	"medium": {"nodes": 20000, "time": 1.0, "noise": 15},
+	"hard": {"nodes": 200000, "time": 5.0, "noise": 0},
+	"expert": {"nodes": None, "time": None, "noise": 0},
+}
+
+def load_weights(path=WEIGHTS_FILE):
+	"""
+	Replaces HEURISTIC_WEIGHTS with the values in a JSON weight file; returns False if the file does not exist.
+	"""
+	if not os.path.exists(path):
+		return False
+	with open(path) as f:
+		weights = json.load(f)
+	unknown = set(weights) - set(HEURISTIC_WEIGHTS)
+	if unknown:
+		raise ValueError(f"Unknown heuristic weights in {path}: {', '.join(sorted(unknown))}")
+	HEURISTIC_WEIGHTS.update(weights)
+	return True
 
-positions_evaluated = 0
 
+load_weights()
 
-def reset_positions_counter():
-	global positions_evaluated
-	positions_evaluated = 0
+
+class BudgetExceeded(Exception):
+	"""
+	Raised inside the search when the node or time budget is used up.
+	"""
+	pass
 
 
 def initial_state():
@@ -113,24 +149,83 @@ def terminal(board):
 	return winner(board) is not None or player(board) is None
 
 
-def utility(board):
+def fallback_move(board):
+	"""
+	Returns the legal move closest to the centre column (used when there is no time to search).
+	"""
+	return min(actions(board), key=lambda action: abs(action[1] - COLUMNS // 2))
+
+
+def mirror(board):
+	"""
+	Returns the board reflected left to right.
+	"""
+	return [row[::-1] for row in board]
+
+
+def position_key(board):
 	"""
-	Returns 100 if PLAYER1 has won, -100 if PLAYER2 has won, 0 otherwise.
+	Returns a unique 49-bit integer key for the board.
+	Each column uses 7 bits: the PLAYER1 pieces from the bottom up, plus a marker bit just above the top piece.
+	"""
+	key = 0
+	for col in range(COLUMNS):
+		column = 0
+		height = 0
+		for row in range(ROWS - 1, -1, -1):
+			cell = board[row][col]
+			if cell == EMPTY:
+				break
+			if cell == PLAYER1:
+				column |= 1 << height
+			height += 1
+		key |= (column | 1 << height) << (col * (ROWS + 1))
+	return key
+
+
+def board_from_key(key):
+	"""
+	Returns the board encoded by position_key.
+	"""
+	board = initial_state()
+	for col in range(COLUMNS):
+		column = (key >> (col * (ROWS + 1))) & ((1 << (ROWS + 1)) - 1)
+		height = column.bit_length() - 1
+		for i in range(height):
+			board[ROWS - 1 - i][col] = PLAYER1 if column >> i & 1 else PLAYER2
+	return board
+
+
+def board_from_moves(moves):
+	"""
+	Returns the board after playing a sequence of columns (0-6, ints or a string of digits) from the empty board.
+	"""
+	board = initial_state()
+	for col in moves:
+		action = next(a for a in actions(board) if a[1] == int(col))
+		board = result(board, action)
+	return board
+
+
+def utility(board, ply=0):
+	"""
+	Returns WIN_SCORE - ply if PLAYER1 has won, -(WIN_SCORE - ply) if PLAYER2 has won, 0 otherwise.
 	"""
 	win = winner(board)
 	if win == PLAYER1:
-		return 1000
+		return WIN_SCORE - ply
 	elif win == PLAYER2:
-		return -1000
+		return ply - WIN_SCORE
 	else:
 		return 0
 
 
-def heuristic(board, action):
+def heuristic_terms(board, action):
 	"""
-	Returns a heuristic value for the board.
+	Returns the terms heuristic() weighs: (threat, open_threes, threes, twos, reach, sign).
+	threat is +-THREAT_SCORE if the player to move can win directly above action (the other terms are then unused),
+	reach is score_action_position() without its base and sign is -1 when PLAYER1 is to move.
 	"""
-	score = 0
 	marks: str = ""
 	open_seq = ""
 	three_seq = []
@@ -141,9 +236,9 @@ def heuristic(board, action):
 		b = result(board, (action[0] - 1, action[1]))
 		threat = terminal(b)
 		if threat and pl == PLAYER1 and winner(b) == PLAYER2:
-			return -1000
+			return -THREAT_SCORE, 0, 0, 0, 0, -1
 		if threat and pl == PLAYER2 and winner(b) == PLAYER1:
-			return 1000
+			return THREAT_SCORE, 0, 0, 0, 0, 1
 
 	if pl == PLAYER2:
 		open_seq = ' RRR '
@@ -184,105 +279,335 @@ def heuristic(board, action):
 			col += 1
 		marks += '|'
 
-	score += marks.count(open_seq) * 30
+	threes = 0
 	for seq in three_seq:
-		score += marks.count(seq) * 20
+		threes += marks.count(seq)
+	twos = 0
 	for seq in two_seq:
-		score += marks.count(seq) * 10
-
-	score += utils.score_action_position(board, action, pl)
-
-	if pl == PLAYER1:
-		return score * -1
-	return score
-
-
-def max_value(board, depth, prev_min_score=None, action=None):
-	"""
-	Returns the maximum value of the board (score, move, path_cost).
-	"""
-	if terminal(board):
-		return utility(board), None, 1
-	if depth == 0:
-		return heuristic(board, action), None, 1
-
-	min_score: float = -math.inf
-	best_path_cost: int = 100000000
-	move = None
-	i = 0
-	global positions_evaluated
-	for action in actions(board):
-		i += 1
-		if (prev_min_score is not None and prev_min_score < min_score) and min_score != -math.inf:
-			break
-		positions_evaluated += 1
-		value = min_value(result(board, action), depth - 1, min_score, action)
-		score: float = value[0]
-		path_cost = value[2]
-		if min_score == -math.inf or (score > min_score or (score == min_score and path_cost < best_path_cost)):
-			min_score = score
-			move = action
-			best_path_cost = path_cost
-		if prev_min_score is None:
-			print(f"+Action {action}: Score {score}, Path Cost {path_cost}, Depth {depth}, Positions Evaluated {positions_evaluated}")
-	return min_score, move, best_path_cost + 1
-
-
-def min_value(board, depth, prev_max_score=None, action=None):
-	"""
-	Returns the minimum value of the board (score, move, path_cost).
-	"""
-	if terminal(board):
-		return utility(board), None, 1
-	if depth == 0:
-		return heuristic(board, action), None, 1
-
-	max_score: float = math.inf
-	best_path_cost: int = 100000000
-	move = None
-	i = 0
-	global positions_evaluated
-	for action in actions(board):
-		i += 1
-		if (prev_max_score is not None and prev_max_score > max_score) and max_score != math.inf:
-			break
-		positions_evaluated += 1
-		value = max_value(result(board, action), depth - 1, max_score, action)
-		score: float = value[0]
-		path_cost = value[2]
-		if max_score == math.inf or (score < max_score or (score == max_score and path_cost < best_path_cost)):
-			max_score = score
-			move = action
-			best_path_cost = path_cost
-		if prev_max_score is None:
-			print(f"-Action {action}: Score {score}, Path Cost {path_cost}, Depth {depth}, Positions Evaluated {positions_evaluated}")
-	return max_score, move, best_path_cost + 1
-
-
-def minimax(board):
-	"""
-	Returns the optimal action for the current player on the board ((score, move, path_cost), depth, positions_evaluated).
-	"""
-	global positions_evaluated
-	reset_positions_counter()
-
-	depth = int((43 - utils.count_empty_places(board)) / 8 + MIN_DEPTH)
-
-	if player(board) == PLAYER1:
-		res = max_value(board, depth)
-		# print("Depth: ", depth)
-		# print("Max Value: ", res[0])
-		# print("Move: ", res[1])
-		# print("Path Cost: ", res[2])
-		# print("Total Positions Evaluated: ", positions_evaluated)
-		# print("\n")
-		return res, depth, positions_evaluated
-	else:
-		res = min_value(board, depth)
-		# print("Depth: ", depth)
-		# print("Min Value: ", res[0])
-		# print("Move: ", res[1])
-		# print("Path Cost: ", res[2])
-		# print("Total Positions Evaluated: ", positions_evaluated)
-		# print("\n")
-		return res, depth, positions_evaluated
+		twos += marks.count(seq)
+	reach = utils.score_action_position(board, action, pl, base=0)
+	return 0, marks.count(open_seq), threes, twos, reach, -1 if pl == PLAYER1 else 1
+
+
+def heuristic(board, action, weights=None):
+	"""
+	Returns a heuristic value for the board (HEURISTIC_WEIGHTS unless weights are given).
+	"""
+	w = HEURISTIC_WEIGHTS if weights is None else weights
+	threat, open_threes, threes, twos, reach, sign = heuristic_terms(board, action)
+	if threat:
+		return threat
+	return sign * (
+		open_threes * w["open_three"] + threes * w["three"] + twos * w["two"] + reach + w["position_base"]
+	)
+
+
+def makes_four(board, row, col, piece):
+	"""
+	Returns True if placing piece at (row, col) completes four in a row through that cell.
+	"""
+	for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+		count = 1
+		for sign in (1, -1):
+			r, c = row + sign * d_row, col + sign * d_col
+			while 0 <= r < ROWS and 0 <= c < COLUMNS and board[r][c] == piece:
+				count += 1
+				r += sign * d_row
+				c += sign * d_col
+		if count >= 4:
+			return True
+	return False
+
+
+def tactical_moves(board, ply):
+	"""
+	Returns (score, moves) for a non-terminal board at the given ply. If the side to move can win
+	immediately, or the opponent has two immediate threats (a proven loss), score is exact and moves
+	holds the move to play; otherwise score is None and moves are the ones worth searching (only the
+	block when the opponent has exactly one immediate threat).
+	"""
+	pl = player(board)
+	opponent = PLAYER2 if pl == PLAYER1 else PLAYER1
+	sign = 1 if pl == PLAYER1 else -1
+	moves = list(actions(board))
+	threats = []
+	for action in moves:
+		if makes_four(board, action[0], action[1], pl):
+			return sign * (WIN_SCORE - ply - 1), [action]
+		if makes_four(board, action[0], action[1], opponent):
+			threats.append(action)
+	if len(threats) > 1:
+		return -sign * (WIN_SCORE - ply - 2), threats[:1]
+	if threats:
+		return None, threats
+	return None, moves
+
+
+class Engine:
+	"""
+	A minimax search engine holding its own configuration, statistics, budgets and cache, so any
+	number of engines can search concurrently in one process (threads, servers, batch APIs).
+	One engine runs one search at a time; keep it between moves to reuse its cache.
+	"""
+
+	def __init__(self, difficulty=None, nodes=None, time_limit=None, noise=None, evaluator=None,
+			min_depth=MIN_DEPTH, cache_size=100000, seed=None, verbose=True, static_analysis=True, weights=None):
+		"""
+		difficulty names a DIFFICULTIES profile; nodes, time_limit and noise override its values.
+		evaluator replaces heuristic() at the leaves (any callable evaluator(board, action), e.g. evaluator.LinearEvaluator).
+		cache_size bounds the number of completed root iterations kept (0 disables the cache),
+		seed seeds the evaluation noise and verbose prints every root action as it is searched.
+		static_analysis proves positions from threat parity (threats.py) and cuts their subtrees.
+		weights replaces HEURISTIC_WEIGHTS for this engine.
+		"""
+		profile = DIFFICULTIES[difficulty] if difficulty is not None else {}
+		self.nodes = profile.get("nodes") if nodes is None else nodes
+		self.time_limit = profile.get("time") if time_limit is None else time_limit
+		self.noise = profile.get("noise", 0) if noise is None else noise
+		self.evaluator = evaluator
+		self.weights = weights
+		self.min_depth = min_depth
+		self.cache_size = cache_size
+		self.verbose = verbose
+		self.rng = random.Random(seed)
+		self.cache = {}
+		self.static_score = None
+		if static_analysis:
+			from threats import static_score  # threats builds on bitboard, which imports this module
+			self.static_score = static_score
+
+		# Statistics
+		self.positions_evaluated = 0
+		self.total_positions = 0
+		self.searches = 0
+		self.cache_hits = 0
+		self.static_proofs = 0
+
+		# Budgets of the running search
+		self.node_limit = None
+		self.deadline = None
+		self.stop_event = None
+
+	def reset_positions_counter(self):
+		self.positions_evaluated = 0
+
+	def clear_cache(self):
+		self.cache.clear()
+
+	def check_budget(self):
+		"""
+		Raises BudgetExceeded if evaluating one more position would exceed the current budget.
+		"""
+		if self.node_limit is not None and self.positions_evaluated >= self.node_limit:
+			raise BudgetExceeded()
+		if self.deadline is not None and time.perf_counter() >= self.deadline:
+			raise BudgetExceeded()
+		if self.stop_event is not None and self.stop_event.is_set():
+			raise BudgetExceeded()
+
+	def evaluate(self, board, action):
+		"""
+		Returns the leaf score of the board from the engine's evaluator (heuristic by default) plus evaluation noise.
+		"""
+		score = heuristic(board, action, self.weights) if self.evaluator is None else self.evaluator(board, action)
+		if self.noise:
+			score += self.rng.gauss(0, self.noise)
+		return score
+
+	def leaf_children(self, board, depth, ply):
+		"""
+		Returns {action: score} for every child of a depth-1 node at the given ply when the engine's
+		evaluator can score all children in one batched call, None otherwise.
+		"""
+		if depth != 1 or not hasattr(self.evaluator, "evaluate_children"):
+			return None
+		children = {}
+		for action, (score, is_terminal) in self.evaluator.evaluate_children(board).items():
+			if is_terminal and score:
+				score = math.copysign(WIN_SCORE - ply - 1, score)
+			elif self.noise:
+				score += self.rng.gauss(0, self.noise)
+			children[action] = score
+		return children
+
+	def max_value(self, board, depth, alpha=-math.inf, beta=math.inf, action=None, ply=0):
+		"""
+		Returns the value of the board with PLAYER1 to move (alpha-beta, clamped to the alpha/beta window).
+		"""
+		if terminal(board):
+			return utility(board, ply)
+		if depth == 0:
+			return self.evaluate(board, action)
+
+		exact, moves = tactical_moves(board, ply)
+		if exact is not None:
+			return exact
+		if self.static_score is not None and depth >= STATIC_MIN_DEPTH:
+			proof = self.static_score(board, ply)
+			if proof is not None and (proof[1] or proof[0] <= alpha):
+				self.static_proofs += 1
+				return proof[0]
+
+		value: float = -math.inf
+		children = self.leaf_children(board, depth, ply)
+		for action in moves:
+			self.check_budget()
+			self.positions_evaluated += 1
+			if children is not None:
+				score = children[action]
+			else:
+				score = self.min_value(result(board, action), depth - 1, alpha, beta, action, ply + 1)
+			if score > value:
+				value = score
+			if value >= beta:
+				break
+			alpha = max(alpha, value)
+		return value
+
+	def min_value(self, board, depth, alpha=-math.inf, beta=math.inf, action=None, ply=0):
+		"""
+		Returns the value of the board with PLAYER2 to move (alpha-beta, clamped to the alpha/beta window).
+		"""
+		if terminal(board):
+			return utility(board, ply)
+		if depth == 0:
+			return self.evaluate(board, action)
+
+		exact, moves = tactical_moves(board, ply)
+		if exact is not None:
+			return exact
+		if self.static_score is not None and depth >= STATIC_MIN_DEPTH:
+			proof = self.static_score(board, ply)
+			if proof is not None and (proof[1] or proof[0] >= beta):
+				self.static_proofs += 1
+				return proof[0]
+
+		value: float = math.inf
+		children = self.leaf_children(board, depth, ply)
+		for action in moves:
+			self.check_budget()
+			self.positions_evaluated += 1
+			if children is not None:
+				score = children[action]
+			else:
+				score = self.max_value(result(board, action), depth - 1, alpha, beta, action, ply + 1)
+			if score < value:
+				value = score
+			if value <= alpha:
+				break
+			beta = min(beta, value)
+		return value
+
+	def root_search(self, board, depth):
+		"""
+		Returns (score, move) for the player to move, searching every root action to the given depth.
+		"""
+		exact, moves = tactical_moves(board, 0)
+		if exact is not None:
+			return exact, moves[0]
+
+		maximizing = player(board) == PLAYER1
+		alpha, beta = -math.inf, math.inf
+		best_score = -math.inf if maximizing else math.inf
+		move = None
+		children = self.leaf_children(board, depth, 0)
+		for action in moves:
+			self.check_budget()
+			self.positions_evaluated += 1
+			if children is not None:
+				score = children[action]
+			elif maximizing:
+				score = self.min_value(result(board, action), depth - 1, alpha, beta, action, 1)
+			else:
+				score = self.max_value(result(board, action), depth - 1, alpha, beta, action, 1)
+			if (score > best_score) if maximizing else (score < best_score):
+				best_score = score
+				move = action
+			if maximizing:
+				alpha = max(alpha, best_score)
+			else:
+				beta = min(beta, best_score)
+			if self.verbose:
+				print(f"{'+' if maximizing else '-'}Action {action}: Score {score}, Depth {depth}, Positions Evaluated {self.positions_evaluated}")
+		return best_score, move
+
+	def cached_root_search(self, board, key, depth):
+		"""
+		Returns root_search(board, depth), reusing and filling the cache when it applies
+		(deterministic leaf scores only).
+		"""
+		if key is None:
+			return self.root_search(board, depth)
+		if (key, depth) in self.cache:
+			self.cache_hits += 1
+			return self.cache[key, depth]
+		res = self.root_search(board, depth)
+		if len(self.cache) >= self.cache_size:
+			del self.cache[next(iter(self.cache))]  # evict the oldest entry
+		self.cache[key, depth] = res
+		return res
+
+	def search(self, board, max_depth=None, nodes=None, time_limit=None, stop=None, info=None):
+		"""
+		Returns the optimal action for the current player on the board ((score, move), depth, positions_evaluated).
+		nodes and time_limit override the engine's budgets for this search. With a budget the search deepens
+		iteratively, stops exactly at the budget and returns the result of the deepest completed iteration.
+		max_depth caps iterative deepening (by default the classic depth formula when there is no budget),
+		stop is a threading.Event that ends the search like an exhausted budget and info(depth, score, move, positions)
+		is called after every completed iteration. A board that is already won or full returns its utility and no move.
+		"""
+		if terminal(board):
+			return (utility(board), None), 0, 0
+		nodes = self.nodes if nodes is None else nodes
+		time_limit = self.time_limit if time_limit is None else time_limit
+		default_depth = int((43 - utils.count_empty_places(board)) / 8 + self.min_depth)
+
+		self.reset_positions_counter()
+		self.node_limit = nodes
+		self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+		self.stop_event = stop
+		self.searches += 1
+		try:
+			if nodes is None and time_limit is None and max_depth is None and stop is None and info is None:
+				return self.root_search(board, default_depth), default_depth, self.positions_evaluated
+
+			if max_depth is None:
+				max_depth = default_depth if nodes is None and time_limit is None else utils.count_empty_places(board)
+			deterministic = not self.noise and self.evaluator is None
+			key = position_key(board) if deterministic and self.cache_size else None
+			res, depth = (None, fallback_move(board)), 0
+			for next_depth in range(1, max_depth + 1):
+				try:
+					res = self.cached_root_search(board, key, next_depth)
+				except BudgetExceeded:
+					break
+				depth = next_depth
+				if info is not None:
+					info(depth, res[0], res[1], self.positions_evaluated)
+				if abs(res[0]) >= WIN_SCORE - depth - 1:
+					break  # a win or loss inside the search horizon, deeper iterations cannot change it
+			return res, depth, self.positions_evaluated
+		finally:
+			self.total_positions += self.positions_evaluated
+			self.node_limit = None
+			self.deadline = None
+			self.stop_event = None
+
+
+def minimax(board, difficulty=None, nodes=None, time_limit=None, noise=None, evaluator=None, profile=None,
+		max_depth=None, stop=None, info=None):
+	"""
+	Returns the optimal action for the current player on the board ((score, move), depth, positions_evaluated).
+	A thin wrapper running Engine(difficulty, nodes, time_limit, noise, evaluator).search(board, max_depth, stop=stop, info=info)
+	on a fresh engine; see Engine for the parameters.
+	profile (True, or a path prefix for .pstats/.collapsed files) runs the search under profiling.profile_call.
+	"""
+	if profile:
+		from profiling import profile_call
+		return profile_call(
+			minimax, board, difficulty, nodes, time_limit, noise, evaluator,
+			output=profile if isinstance(profile, str) else None, quiet=False,
+			max_depth=max_depth, stop=stop, info=info
+		)
+	engine = Engine(difficulty, nodes, time_limit, noise, evaluator)
+	return engine.search(board, max_depth, stop=stop, info=info)
@@ -0,0 +1,154 @@
+import numpy as np
+
+import connect_four as cf
+
+CELLS = cf.ROWS * cf.COLUMNS
+
+
+def _windows():
+	"""Returns the flat cell indices (row * COLUMNS + col) of every line of four on the board."""
+	windows = []
+	for row in range(cf.ROWS):
+		for col in range(cf.COLUMNS):
+			for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+				end_row, end_col = row + 3 * d_row, col + 3 * d_col
+				if 0 <= end_row < cf.ROWS and 0 <= end_col < cf.COLUMNS:
+					windows.append([(row + i * d_row) * cf.COLUMNS + col + i * d_col for i in range(4)])
+	return np.array(windows, dtype=np.intp)
+
+
+WINDOWS = _windows()
+
+# Feature layout: windows holding exactly 1/2/3 PLAYER1 pieces and no PLAYER2 piece, the same for PLAYER2,
+# then PLAYER1 occupancy of each cell and PLAYER2 occupancy of each cell.
+WINDOW_FEATURES = 6
+FEATURES = WINDOW_FEATURES + 2 * CELLS
+
+# Number of windows through each cell: the usual centre-preference table
+CELL_WINDOWS = np.bincount(WINDOWS.ravel(), minlength=CELLS)
+
+
+def default_weights():
+	"""
+	Returns weights mirroring heuristic(): 20 per three, 10 per two, 1 per single in an open
+	window, plus the number of windows through each occupied cell; PLAYER2 features are negated.
+	"""
+	return np.concatenate([
+		[1, 10, 20], [-1, -10, -20],
+		CELL_WINDOWS, -CELL_WINDOWS
+	]).astype(np.float64)
+
+
+def board_planes(board):
+	"""
+	Returns (p1, p2) boolean occupancy vectors of length ROWS * COLUMNS for the board.
+	"""
+	cells = np.frombuffer("".join("".join(row) for row in board).encode(), dtype=np.uint8)
+	return cells == ord(cf.PLAYER1), cells == ord(cf.PLAYER2)
+
+
+def features_batch(p1, p2):
+	"""
+	Returns the (n, FEATURES) feature matrix for n positions given as (n, CELLS) occupancy arrays.
+	"""
+	count1 = p1[:, WINDOWS].sum(axis=2)
+	count2 = p2[:, WINDOWS].sum(axis=2)
+	free1 = count2 == 0
+	free2 = count1 == 0
+	out = np.empty((len(p1), FEATURES), dtype=np.float64)
+	for k in range(1, 4):
+		out[:, k - 1] = ((count1 == k) & free1).sum(axis=1)
+		out[:, k + 2] = ((count2 == k) & free2).sum(axis=1)
+	out[:, WINDOW_FEATURES:WINDOW_FEATURES + CELLS] = p1
+	out[:, WINDOW_FEATURES + CELLS:] = p2
+	return out
+
+
+def features(board):
+	"""
+	Returns the feature vector of a single board.
+	"""
+	p1, p2 = board_planes(board)
+	return features_batch(p1[np.newaxis], p2[np.newaxis])[0]
+
+
+class LinearEvaluator:
+	"""
+	Scores positions as a dot product of line/cell features with a weight vector.
+	Scores follow utility(): positive favours PLAYER1. Pass an instance to minimax(evaluator=...)
+	to replace heuristic(); the search then scores all children of depth-1 nodes in one call.
+	"""
+
+	def __init__(self, weights=None):
+		self.weights = default_weights() if weights is None else np.asarray(weights, dtype=np.float64)
+		if self.weights.shape != (FEATURES,):
+			raise ValueError(f"Expected {FEATURES} weights, got {self.weights.shape}")
+
+	def __call__(self, board, action=None):
+		"""Returns the score of a single board (action is accepted for compatibility with heuristic)."""
+		return float(features(board) @ self.weights)
+
+	def evaluate_batch(self, p1, p2):
+		"""Returns the scores of n positions given as (n, CELLS) occupancy arrays."""
+		return features_batch(p1, p2) @ self.weights
+
+	def evaluate_children(self, board):
+		"""
+		Returns {action: (score, terminal)} for every legal move on a non-terminal board, scoring all
+		children in one batched call. Terminal children get their utility() score (ply 0).
+		"""
+		moves = sorted(cf.actions(board))
+		p1, p2 = board_planes(board)
+		mover_is_p1 = cf.player(board) == cf.PLAYER1
+		n = len(moves)
+		rows = np.arange(n)
+		index = np.array([row * cf.COLUMNS + col for row, col in moves], dtype=np.intp)
+		child1 = np.repeat(p1[np.newaxis], n, axis=0)
+		child2 = np.repeat(p2[np.newaxis], n, axis=0)
+		(child1 if mover_is_p1 else child2)[rows, index] = True
+
+		scores = self.evaluate_batch(child1, child2)
+		mover = child1 if mover_is_p1 else child2
+		wins = (mover[:, WINDOWS].sum(axis=2) == 4).any(axis=1)
+		full = int(p1.sum() + p2.sum()) + 1 == CELLS
+		win_score = cf.WIN_SCORE if mover_is_p1 else -cf.WIN_SCORE
+		children = {}
+		for i, move in enumerate(moves):
+			if wins[i]:
+				children[move] = (win_score, True)
+			elif full:
+				children[move] = (0, True)
+			else:
+				children[move] = (float(scores[i]), False)
+		return children
+
+	def fit(self, boards, targets, ridge=1.0):
+		"""
+		Fit the weights to targets (e.g. search scores) by ridge-regularised least squares.
+		"""
+		planes = [board_planes(board) for board in boards]
+		x = features_batch(np.array([p[0] for p in planes]), np.array([p[1] for p in planes]))
+		y = np.asarray(targets, dtype=np.float64)
+		self.weights = np.linalg.solve(x.T @ x + ridge * np.eye(FEATURES), x.T @ y)
+		return self
+
+	def fit_shards(self, directory, target="score", limit=None, ridge=1.0):
+		"""
+		Fit the weights to self-play shards (see selfplay.py); target is "score" or "result".
+		"""
+		from selfplay import read_shards
+		keys, targets = [], []
+		for shard in read_shards(directory):
+			keys.extend(shard["key"].tolist())
+			targets.extend(shard[target].tolist())
+			if limit is not None and len(keys) >= limit:
+				break
+		keys, targets = keys[:limit], targets[:limit]
+		return self.fit([cf.board_from_key(key) for key in keys], targets, ridge)
+
+	def save(self, path):
+		np.save(path, self.weights)
+
+	@classmethod
+	def load(cls, path):
+		return cls(np.load(path))
@@ -0,0 +1,174 @@
+import os
+import sys
+import importlib.util
+
+import numpy as np
+
+import connect_four as cf
+import bitboard as bb
+
+# Alpha-beta search on (current, mask) bitboards written as plain integer functions so Numba can
+# compile them. Numba is optional: without it (or with CONNECT_FOUR_NO_JIT set) the same functions run
+# as ordinary Python. Bitboards use 49 bits, so they fit the int64 Numba infers; bits shifted past
+# bit 63 are dropped, which only affects cells outside BOARD_MASK.
+
+try:
+	from numba import njit
+except ImportError:
+	njit = None
+
+JIT = njit is not None and not os.environ.get("CONNECT_FOUR_NO_JIT")
+
+# Module-level constants, frozen into the compiled code
+ROWS = cf.ROWS
+COLUMNS = cf.COLUMNS
+H1 = bb.H1
+CELLS = bb.CELLS
+BOTTOM_MASK = bb.BOTTOM_MASK
+BOARD_MASK = bb.BOARD_MASK
+CENTRE_MASK = bb.column_mask(COLUMNS // 2)
+WIN_SCORE = cf.WIN_SCORE
+ORDER = (3, 2, 4, 1, 5, 0, 6)  # centre columns first
+THREAT_WEIGHT = 4
+
+
+def jit(function):
+	return njit(cache=True)(function) if JIT else function
+
+
+@jit
+def popcount(x):
+	count = 0
+	while x:
+		x &= x - 1
+		count += 1
+	return count
+
+
+@jit
+def can_play(mask, col):
+	return (mask >> (ROWS - 1 + col * H1)) & 1 == 0
+
+
+@jit
+def alignment(pos):
+	"""Returns True if the stones in pos contain four in a row"""
+	for shift in (1, H1, H1 - 1, H1 + 1):
+		m = pos & (pos >> shift)
+		if m & (m >> (2 * shift)):
+			return True
+	return False
+
+
+@jit
+def is_winning_move(current, mask, col):
+	"""Returns True if the side to move wins by playing col"""
+	column = ((1 << ROWS) - 1) << (col * H1)
+	return alignment(current | ((mask + (1 << (col * H1))) & column))
+
+
+@jit
+def winning_cells(pos, mask):
+	"""Returns a mask of the empty cells that would complete four in a row for the stones in pos"""
+	r = (pos << 1) & (pos << 2) & (pos << 3)
+	for shift in (H1, H1 - 1, H1 + 1):
+		p = (pos << shift) & (pos << (2 * shift))
+		r |= p & (pos << (3 * shift))
+		r |= p & (pos >> shift)
+		p = (pos >> shift) & (pos >> (2 * shift))
+		r |= p & (pos << shift)
+		r |= p & (pos >> (3 * shift))
+	return r & (BOARD_MASK ^ mask)
+
+
+@jit
+def evaluate(current, mask):
+	"""Returns the static score for the side to move: threat cells and centre stones, minus the opponent's"""
+	other = current ^ mask
+	threats = popcount(winning_cells(current, mask)) - popcount(winning_cells(other, mask))
+	return THREAT_WEIGHT * threats + popcount(current & CENTRE_MASK) - popcount(other & CENTRE_MASK)
+
+
+@jit
+def negamax(current, mask, moves, ply, depth, alpha, beta, nodes):
+	"""
+	Returns the score of a non-terminal position for the side to move (fail-soft alpha-beta); a win n
+	plies from the root scores WIN_SCORE - n. nodes is a one-element int64 array counting visited positions.
+	"""
+	nodes[0] += 1
+	if moves == CELLS:
+		return 0
+	for col in ORDER:
+		if can_play(mask, col) and is_winning_move(current, mask, col):
+			return WIN_SCORE - ply - 1
+	if depth == 0:
+		return evaluate(current, mask)
+	best = -WIN_SCORE
+	for col in ORDER:
+		if can_play(mask, col):
+			score = -negamax(current ^ mask, mask | (mask + (1 << (col * H1))), moves + 1, ply + 1, depth - 1,
+				-beta, -alpha, nodes)
+			if score > best:
+				best = score
+				if score > alpha:
+					alpha = score
+					if alpha >= beta:
+						break
+	return best
+
+
+@jit
+def root(current, mask, moves, depth, nodes):
+	"""Returns (column, score) of the best move for the side to move, searched depth plies deep"""
+	best_col = -1
+	best = -WIN_SCORE - 1
+	for col in ORDER:
+		if can_play(mask, col):
+			if is_winning_move(current, mask, col):
+				return col, WIN_SCORE - 1
+			score = -negamax(current ^ mask, mask | (mask + (1 << (col * H1))), moves + 1, 1, depth - 1,
+				-WIN_SCORE, -max(best, -WIN_SCORE), nodes)
+			if score > best:
+				best_col = col
+				best = score
+	return best_col, best
+
+
+def search(board, depth=8, module=None):
+	"""
+	Returns ((score, action), depth, positions_evaluated) like cf.minimax, with the score from PLAYER1's
+	point of view. module selects the kernels to run (this module by default, or pure_kernels()).
+	"""
+	module = module or sys.modules[__name__]
+	current, mask, moves = bb.from_board(board)
+	if cf.terminal(board):
+		return (cf.utility(board, 0), None), 0, 0
+	nodes = np.zeros(1, dtype=np.int64)
+	col, score = module.root(current, mask, moves, max(depth, 1), nodes)
+	sign = 1 if cf.player(board) == cf.PLAYER1 else -1
+	return (sign * int(score), (bb.row_of(mask, int(col)), int(col))), max(depth, 1), int(nodes[0])
+
+
+def warm_up(module=None):
+	"""Compile the kernels (if JIT is on) so the first timed search doesn't include compilation"""
+	search(cf.initial_state(), depth=2, module=module)
+
+
+_pure = None
+
+
+def pure_kernels():
+	"""Returns a second copy of this module with the kernels as plain Python, whether or not Numba is installed"""
+	global _pure
+	if _pure is None:
+		if not JIT:
+			_pure = sys.modules[__name__]
+		else:
+			spec = importlib.util.spec_from_file_location("kernels_pure", __file__)
+			_pure = importlib.util.module_from_spec(spec)
+			os.environ["CONNECT_FOUR_NO_JIT"] = "1"
+			try:
+				spec.loader.exec_module(_pure)
+			finally:
+				del os.environ["CONNECT_FOUR_NO_JIT"]
+	return _pure
@@ -0,0 +1,69 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from utils import percentile
+
+
+async def request(reader, writer, message):
+	writer.write(json.dumps(message).encode() + b"\n")
+	await writer.drain()
+	return json.loads(await reader.readline())
+
+
+async def play_game(host, port, budget, latencies, errors):
+	"""Play one game of random legal moves against the server, recording per-move latency"""
+	reader, writer = await asyncio.open_connection(host, port)
+	try:
+		state = await request(reader, writer, {"op": "new", "ai_first": random.random() < 0.5, "budget": budget})
+		while state.get("game") is not None and not state.get("over"):
+			top = state["board"][0]
+			column = random.choice([c for c, cell in enumerate(top) if cell == " "])
+			start = time.perf_counter()
+			response = await request(reader, writer, {
+				"op": "move", "game": state["game"], "column": column, "budget": budget
+			})
+			if response["ok"]:
+				latencies.append(time.perf_counter() - start)
+			else:
+				errors[response["error"]] = errors.get(response["error"], 0) + 1
+				if response["error"] == "busy":
+					await asyncio.sleep(0.05)
+					continue
+				break
+			state = response
+		if state.get("game") is not None:
+			await request(reader, writer, {"op": "close", "game": state["game"]})
+	finally:
+		writer.close()
+
+
+async def run(args):
+	latencies = []
+	errors = {}
+	start = time.perf_counter()
+	await asyncio.gather(*(
+		play_game(args.host, args.port, args.budget, latencies, errors) for _ in range(args.games)
+	))
+	elapsed = time.perf_counter() - start
+	print(f"{args.games} concurrent games, {len(latencies)} moves in {elapsed:.1f}s "
+		f"({len(latencies) / elapsed:.1f} moves/s)")
+	print(f"move latency p50 {percentile(latencies, 50) * 1000:.0f} ms, "
+		f"p99 {percentile(latencies, 99) * 1000:.0f} ms, max {max(latencies, default=0) * 1000:.0f} ms")
+	if errors:
+		print("errors:", ", ".join(f"{k}={v}" for k, v in sorted(errors.items())))
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Load generator for server.py")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("-n", "--games", type=int, default=16, help="number of concurrent games")
+	parser.add_argument("--budget", type=float, default=None, help="seconds per AI move requested from the server")
+	asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,318 @@
+import os
+import math
+import time
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import connect_four as cf
+import bitboard as bb
+from batch import init_worker
+
+OPEN, WON, DRAWN = 0, 1, 2  # node states: WON means the player who moved into the node has won
+
+# PUCT prior: share of the lines of four through the bottom cell of each column
+CENTRE_PRIOR = [3, 4, 5, 7, 5, 4, 3]
+CENTRE_PRIOR = [p / sum(CENTRE_PRIOR) for p in CENTRE_PRIOR]
+
+
+class MCTS:
+	"""
+	Monte Carlo Tree Search engine (UCT or PUCT) over bitboard positions.
+	Nodes live in parallel typed arrays; the children of a node occupy a contiguous block.
+	The tree under the position reached since the previous search is kept and reused.
+	"""
+
+	def __init__(self, c=1.4, policy="uct", playout="heuristic", max_nodes=2000000, seed=None):
+		if policy not in ("uct", "puct"):
+			raise ValueError(f"Unknown policy {policy!r}")
+		if playout not in ("random", "heuristic"):
+			raise ValueError(f"Unknown playout {playout!r}")
+		self.c = c
+		self.policy = policy
+		self.playout = self.heuristic_playout if playout == "heuristic" else self.random_playout
+		self.max_nodes = max_nodes
+		self.rng = random.Random(seed)
+		self.root_state = None
+		self.clear()
+
+	def clear(self):
+		self.parent = array("i")
+		self.move = array("b")
+		self.first_child = array("i")
+		self.n_children = array("b")
+		self.state = array("b")
+		self.visits = array("l")
+		self.wins = array("d")
+
+	def __len__(self):
+		return len(self.parent)
+
+	def add_node(self, parent, col, state, visits=0, wins=0.0):
+		self.parent.append(parent)
+		self.move.append(col)
+		self.first_child.append(0)
+		self.n_children.append(0)
+		self.state.append(state)
+		self.visits.append(visits)
+		self.wins.append(wins)
+		return len(self.parent) - 1
+
+	def children(self, node):
+		start = self.first_child[node]
+		return range(start, start + self.n_children[node])
+
+	def set_root(self, position):
+		"""Make position (current, mask, moves) the root, reusing a matching subtree if one exists"""
+		if self.root_state is not None and len(self):
+			node = self.find(position)
+			if node is not None:
+				self.compact(node)
+				self.root_state = position
+				return
+		self.clear()
+		self.root_state = position
+		self.add_node(-1, -1, OPEN)
+
+	def find(self, position):
+		"""Returns the node for position if it is a child or grandchild of the root, None otherwise."""
+		current, mask, moves = self.root_state
+		if not 0 <= position[2] - moves <= 2:
+			return None
+		frontier = [(0, current, mask)]
+		for _ in range(moves, position[2]):
+			frontier = [
+				(child, *bb.play(cur, msk, self.move[child]))
+				for node, cur, msk in frontier for child in self.children(node)
+			]
+		for node, cur, msk in frontier:
+			if (cur, msk) == position[:2]:
+				return node
+		return None
+
+	def compact(self, root):
+		"""Rebuild the node arrays so they only hold the subtree under root"""
+		old = (self.move, self.first_child, self.n_children, self.state, self.visits, self.wins)
+		move, first_child, n_children, state, visits, wins = old
+		self.clear()
+		self.add_node(-1, move[root], state[root], visits[root], wins[root])
+		queue = [(root, 0)]
+		while queue:
+			old_node, new_node = queue.pop()
+			count = n_children[old_node]
+			if not count:
+				continue
+			start = len(self)
+			self.first_child[new_node] = start
+			self.n_children[new_node] = count
+			for i in range(count):
+				child = first_child[old_node] + i
+				self.add_node(new_node, move[child], state[child], visits[child], wins[child])
+				queue.append((child, start + i))
+
+	def expand(self, node, current, mask, moves):
+		start = len(self)
+		for col in bb.legal_columns(mask):
+			if bb.is_winning_move(current, mask, col):
+				state = WON
+			elif moves + 1 == bb.CELLS:
+				state = DRAWN
+			else:
+				state = OPEN
+			self.add_node(node, col, state)
+		self.first_child[node] = start
+		self.n_children[node] = len(self) - start
+
+	def select(self, node):
+		"""Returns the child of node with the highest UCT/PUCT score"""
+		log_n = math.log(self.visits[node] + 1)
+		sqrt_n = math.sqrt(self.visits[node] + 1)
+		best, best_score = -1, -math.inf
+		for child in self.children(node):
+			n = self.visits[child]
+			if self.policy == "uct":
+				if n == 0:
+					return child
+				score = self.wins[child] / n + self.c * math.sqrt(log_n / n)
+			else:
+				q = self.wins[child] / n if n else 0.5
+				score = q + self.c * CENTRE_PRIOR[self.move[child]] * sqrt_n / (1 + n)
+			if score > best_score:
+				best, best_score = child, score
+		return best
+
+	def random_playout(self, current, mask, moves):
+		"""Returns 1 if the side to move wins a random playout, 0 if it loses, 0.5 for a draw."""
+		rng = self.rng
+		side = 1
+		while moves < bb.CELLS:
+			col = rng.choice(bb.legal_columns(mask))
+			if bb.is_winning_move(current, mask, col):
+				return side
+			current, mask = bb.play(current, mask, col)
+			moves += 1
+			side = 1 - side
+		return 0.5
+
+	def heuristic_playout(self, current, mask, moves):
+		"""Like random_playout, but takes immediate wins and blocks immediate losses."""
+		rng = self.rng
+		side = 1
+		while moves < bb.CELLS:
+			playable = bb.possible(mask)
+			if bb.winning_cells(current, mask) & playable:
+				return side
+			threats = bb.winning_cells(current ^ mask, mask) & playable
+			if threats:
+				col = (threats & -threats).bit_length() // bb.H1
+			else:
+				col = rng.choice(bb.legal_columns(mask))
+			current, mask = bb.play(current, mask, col)
+			moves += 1
+			side = 1 - side
+		return 0.5
+
+	def iterate(self):
+		"""Run one selection / expansion / playout / backpropagation step; returns the leaf depth."""
+		current, mask, moves = self.root_state
+		node = 0
+		depth = 0
+		while self.n_children[node] and self.state[node] == OPEN:
+			node = self.select(node)
+			current, mask = bb.play(current, mask, self.move[node])
+			moves += 1
+			depth += 1
+
+		state = self.state[node]
+		if state == WON:
+			reward = 1.0
+		elif state == DRAWN:
+			reward = 0.5
+		else:
+			if self.visits[node] and len(self) + cf.COLUMNS <= self.max_nodes:
+				self.expand(node, current, mask, moves)
+				node = self.select(node)
+				current, mask = bb.play(current, mask, self.move[node])
+				moves += 1
+				depth += 1
+			state = self.state[node]
+			if state == WON:
+				reward = 1.0
+			elif state == DRAWN:
+				reward = 0.5
+			else:
+				# the playout result is for the side to move, the node stores the mover's reward
+				reward = 1.0 - self.playout(current, mask, moves)
+
+		while node != -1:
+			self.visits[node] += 1
+			self.wins[node] += reward
+			reward = 1.0 - reward
+			node = self.parent[node]
+		return depth
+
+	def search(self, board, time_limit=1.0, iterations=None):
+		"""
+		Search the board until the time limit (seconds) or iteration budget runs out.
+		Returns (root statistics {col: (visits, wins)}, iterations run, maximum depth reached).
+		"""
+		if time_limit is None and iterations is None:
+			raise ValueError("MCTS needs a time limit or an iteration budget")
+		self.set_root(bb.from_board(board))
+		if not self.n_children[0]:
+			current, mask, moves = self.root_state
+			self.expand(0, current, mask, moves)
+		deadline = None if time_limit is None else time.perf_counter() + time_limit
+		count = 0
+		max_depth = 0
+		while (iterations is None or count < iterations) and (deadline is None or time.perf_counter() < deadline):
+			max_depth = max(max_depth, self.iterate())
+			count += 1
+		stats = {self.move[child]: (self.visits[child], self.wins[child]) for child in self.children(0)}
+		return stats, count, max_depth
+
+
+_pool = None
+_pool_workers = 0
+
+
+def _worker_search(board, time_limit, iterations, seed):
+	"""Root-parallel search in a pool worker, on a fresh tree so no state is shared between callers"""
+	return MCTS(seed=seed).search(board, time_limit, iterations)
+
+
+def best_from_stats(board, stats, count, max_depth):
+	"""Returns the minimax-shaped result ((score, move), depth, positions) for root statistics."""
+	col, (visits, wins) = max(stats.items(), key=lambda item: item[1][0])
+	move = (bb.row_of(bb.from_board(board)[1], col), col)
+	q = wins / visits if visits else 0.5
+	score = (2 * q - 1) * cf.WIN_SCORE
+	if cf.player(board) == cf.PLAYER2:
+		score = -score
+	return (score, move), max_depth, count
+
+
+def mcts(board, time_limit=1.0, iterations=None, workers=1, engine=None):
+	"""
+	Returns the best action for the current player, in the same shape as minimax():
+	((score, move), depth, positions_evaluated), where score is the expected result on
+	utility()'s +-WIN_SCORE scale, depth the deepest node reached and positions_evaluated the playouts run.
+	With workers > 1 the search is root-parallel: independent trees in a process pool, merged by visits.
+	Without an engine each call searches a fresh tree; pass an MCTS to reuse its tree between moves.
+	A board without legal moves returns its utility and no move.
+	"""
+	if cf.terminal(board):
+		return (cf.utility(board), None), 0, 0
+	if workers <= 1:
+		return best_from_stats(board, *(engine if engine is not None else MCTS()).search(board, time_limit, iterations))
+
+	global _pool, _pool_workers
+	if _pool is None or _pool_workers != workers:
+		if _pool is not None:
+			_pool.shutdown()
+		_pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+		_pool_workers = workers
+	per_worker = None if iterations is None else max(iterations // workers, 1)
+	futures = [
+		_pool.submit(_worker_search, board, time_limit, per_worker, random.randrange(1 << 30))
+		for _ in range(workers)
+	]
+	merged = {}
+	count = max_depth = 0
+	for future in futures:
+		stats, n, depth = future.result()
+		count += n
+		max_depth = max(max_depth, depth)
+		for col, (visits, wins) in stats.items():
+			total_visits, total_wins = merged.get(col, (0, 0.0))
+			merged[col] = (total_visits + visits, total_wins + wins)
+	return best_from_stats(board, merged, count, max_depth)
+
+
+def main():
+	import argparse
+	parser = argparse.ArgumentParser(description="Play MCTS against minimax")
+	parser.add_argument("--time", type=float, default=1.0, help="MCTS seconds per move")
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+	parser.add_argument("--games", type=int, default=2)
+	args = parser.parse_args()
+
+	score = 0
+	for game in range(args.games):
+		board = cf.initial_state()
+		mcts_player = cf.PLAYER1 if game % 2 == 0 else cf.PLAYER2
+		engine = MCTS()  # one tree per game, reused between its moves
+		while not cf.terminal(board):
+			if cf.player(board) == mcts_player:
+				res = mcts(board, args.time, workers=args.workers, engine=engine)
+			else:
+				res = cf.minimax(board, "hard")
+			board = cf.result(board, res[0][1])
+		win = cf.winner(board)
+		score += 1 if win == mcts_player else 0.5 if win is None else 0
+		print(f"game {game + 1}: MCTS as {mcts_player}, winner {win or 'draw'}")
+	print(f"MCTS score {score}/{args.games}")
+
+
+if __name__ == '__main__':
+	main()
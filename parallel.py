@@ -0,0 +1,227 @@
+import os
+import sys
+import math
+import time
+import threading
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import connect_four as cf
+import utils
+from batch import init_worker
+
+# Root splitting after Young Brothers Wait: the first root move (the eldest brother) is searched alone to
+# set the alpha-beta window, then the remaining moves are searched in parallel with that window. Every
+# task runs on its own Engine, so workers share nothing but the completed-iteration cache; the best move
+# and score are the same as a serial search, only the node count differs.
+
+
+def gil_enabled():
+	"""Returns False when running on a free-threaded build with the GIL disabled"""
+	is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+	return True if is_gil_enabled is None else is_gil_enabled()
+
+
+class SharedCache:
+	"""A bounded {key: value} cache that several threads can read and fill (oldest entries are evicted)"""
+
+	def __init__(self, size=100000):
+		self.size = size
+		self.entries = {}
+		self.lock = threading.Lock()
+
+	def get(self, key):
+		with self.lock:
+			return self.entries.get(key)
+
+	def put(self, key, value):
+		if not self.size:
+			return
+		with self.lock:
+			if len(self.entries) >= self.size:
+				del self.entries[next(iter(self.entries))]
+			self.entries[key] = value
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+
+	def __len__(self):
+		return len(self.entries)
+
+
+def child_value(board, action, depth, alpha, beta, deadline=None, stop=None, static_analysis=True, weights=None):
+	"""
+	Returns (score, positions) of one root action searched depth plies deep (the action included) on a
+	fresh Engine; raises cf.BudgetExceeded past the deadline (a time.time() value, so it holds in worker
+	processes and for queued tasks) or once stop is set.
+	"""
+	engine = cf.Engine(verbose=False, static_analysis=static_analysis, weights=weights)
+	engine.deadline = None if deadline is None else time.perf_counter() + deadline - time.time()
+	engine.stop_event = stop
+	engine.check_budget()
+	child = cf.result(board, action)
+	if cf.player(board) == cf.PLAYER1:
+		score = engine.min_value(child, depth - 1, alpha, beta, action, 1)
+	else:
+		score = engine.max_value(child, depth - 1, alpha, beta, action, 1)
+	return score, engine.positions_evaluated + 1
+
+
+class ParallelSearcher:
+	"""
+	Searches one position with its root moves split across a thread pool (or a process pool, for
+	comparison). Threads only run in parallel on free-threaded builds: with the GIL enabled a thread
+	searcher falls back to a serial search unless force is set.
+	"""
+
+	def __init__(self, workers=None, executor="thread", cache_size=100000, static_analysis=True, weights=None,
+			force=False):
+		self.workers = workers or os.cpu_count() or 1
+		self.executor = executor
+		self.fallback = executor == "thread" and gil_enabled() and not force
+		if self.fallback:
+			self.workers = 1
+		self.cache = SharedCache(cache_size)
+		self.static_analysis = static_analysis
+		self.weights = weights
+		self.positions_lock = threading.Lock()
+		self.total_positions = 0
+		self.pool = None
+		if self.workers > 1:
+			if executor == "thread":
+				self.pool = ThreadPoolExecutor(max_workers=self.workers)
+			else:
+				self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+
+	def close(self):
+		if self.pool is not None:
+			self.pool.shutdown(cancel_futures=True)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def add_positions(self, count):
+		with self.positions_lock:
+			self.total_positions += count
+
+	def root_search(self, board, depth, deadline=None, stop=None):
+		"""
+		Returns ((score, move), positions) for the player to move, searching every root action to the
+		given depth; raises cf.BudgetExceeded past the deadline (time.time()) or once stop is set.
+		"""
+		exact, moves = cf.tactical_moves(board, 0)
+		if exact is not None:
+			return (exact, moves[0]), 0
+		maximizing = cf.player(board) == cf.PLAYER1
+		alpha, beta = -math.inf, math.inf
+		best_score, move = (-math.inf if maximizing else math.inf), None
+		positions = 0
+
+		def task(action, alpha, beta):
+			# a threading.Event cannot be sent to worker processes; they stop at the deadline only
+			event = stop if self.executor == "thread" else None
+			return board, action, depth, alpha, beta, deadline, event, self.static_analysis, self.weights
+
+		def better(score):
+			return (score > best_score) if maximizing else (score < best_score)
+
+		# The eldest brother (and every move, in a serial search) narrows the window before the rest start
+		eldest = len(moves) if self.pool is None else 1
+		for action in moves[:eldest]:
+			score, count = child_value(*task(action, alpha, beta))
+			positions += count
+			if better(score):
+				best_score, move = score, action
+			if maximizing:
+				alpha = max(alpha, best_score)
+			else:
+				beta = min(beta, best_score)
+
+		if moves[eldest:]:
+			futures = [self.pool.submit(child_value, *task(action, alpha, beta)) for action in moves[eldest:]]
+			results = []
+			for future in futures:
+				try:
+					results.append(future.result())
+				except cf.BudgetExceeded:
+					for pending in futures:
+						pending.cancel()
+					raise
+			for action, (score, count) in zip(moves[eldest:], results):
+				positions += count
+				if better(score):
+					best_score, move = score, action
+		return (best_score, move), positions
+
+	def search(self, board, max_depth=None, time_limit=None, stop=None, info=None):
+		"""
+		Returns ((score, move), depth, positions_evaluated) like Engine.search: iterative deepening up to
+		max_depth (by default the classic depth formula, or every empty cell under a time limit), returning
+		the deepest completed iteration when time_limit runs out or stop (a threading.Event) is set.
+		"""
+		if cf.terminal(board):
+			return (cf.utility(board), None), 0, 0
+		empty = utils.count_empty_places(board)
+		if max_depth is None:
+			max_depth = int((43 - empty) / 8 + cf.MIN_DEPTH) if time_limit is None else empty
+		deadline = None if time_limit is None else time.time() + time_limit
+		key = cf.position_key(board)
+		res, depth, positions = (None, cf.fallback_move(board)), 0, 0
+		try:
+			for next_depth in range(1, max_depth + 1):
+				cached = self.cache.get((key, next_depth))
+				if cached is None:
+					try:
+						cached, count = self.root_search(board, next_depth, deadline, stop)
+					except cf.BudgetExceeded:
+						break
+					positions += count
+					self.cache.put((key, next_depth), cached)
+				res, depth = cached, next_depth
+				if info is not None:
+					info(depth, res[0], res[1], positions)
+				if abs(res[0]) >= cf.WIN_SCORE - depth - 1:
+					break
+			return res, depth, positions
+		finally:
+			self.add_positions(positions)
+
+
+def main():
+	from benchmark import CORPUS
+	parser = argparse.ArgumentParser(description="Compare thread and process root splitting against a serial search")
+	parser.add_argument("--workers", default="2,4", help="comma-separated worker counts to compare")
+	parser.add_argument("--depth", type=int, default=6)
+	parser.add_argument("--groups", default="opening,midgame", help="comma-separated benchmark corpus groups")
+	args = parser.parse_args()
+
+	groups = args.groups.split(",")
+	boards = [(entry["name"], cf.board_from_moves(entry["moves"])) for entry in CORPUS if entry["group"] in groups]
+	print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil_enabled() else 'disabled'}, "
+		f"{os.cpu_count()} CPUs, {len(boards)} positions, depth {args.depth}")
+
+	def measure(searcher):
+		start = time.perf_counter()
+		results = [searcher.search(board, args.depth) for _, board in boards]
+		return results, time.perf_counter() - start
+
+	with ParallelSearcher(1, cache_size=0) as serial:
+		reference, serial_seconds = measure(serial)
+	serial_positions = sum(r[2] for r in reference)
+	print(f"{'serial':<10}workers  1  {serial_seconds:8.3f}s  nodes {serial_positions:>10,}  speedup  1.00x")
+	for workers in (int(w) for w in args.workers.split(",")):
+		for executor in ("thread", "process"):
+			with ParallelSearcher(workers, executor, cache_size=0, force=True) as searcher:
+				results, seconds = measure(searcher)
+			mismatches = [name for (name, _), r, ref in zip(boards, results, reference) if r[0] != ref[0]]
+			print(f"{executor:<10}workers {workers:>2}  {seconds:8.3f}s  nodes {sum(r[2] for r in results):>10,}  "
+				f"speedup {serial_seconds / seconds:5.2f}x"
+				+ (f"  MISMATCH {', '.join(mismatches)}" if mismatches else ""))
+
+
+if __name__ == '__main__':
+	main()
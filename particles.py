@@ -0,0 +1,96 @@
+import numpy as np
+import pygame
+
+GRAVITY = 0.2
+MIN_SIZE = 2
+MAX_SIZE = 6
+
+
+class ParticlePool:
+	"""
+	Fixed-capacity particle system stored in NumPy arrays.
+	Live particles are always packed at the front of the arrays (indices 0..count-1).
+	"""
+
+	def __init__(self, palette, capacity=2048):
+		self.palette = list(palette)
+		self.capacity = capacity
+		self.count = 0
+		self.x = np.zeros(capacity, dtype=np.float32)
+		self.y = np.zeros(capacity, dtype=np.float32)
+		self.dx = np.zeros(capacity, dtype=np.float32)
+		self.dy = np.zeros(capacity, dtype=np.float32)
+		self.life = np.zeros(capacity, dtype=np.int16)
+		self.size = np.zeros(capacity, dtype=np.uint8)
+		self.colour = np.zeros(capacity, dtype=np.uint8)
+		self.sprites = self.render_sprites()
+
+	def __len__(self):
+		return self.count
+
+	def render_sprites(self):
+		"""Pre-render one circle sprite per (colour index, size)"""
+		sprites = []
+		for colour in self.palette:
+			by_size = []
+			for radius in range(MAX_SIZE + 1):
+				sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+				if radius > 0:
+					pygame.draw.circle(sprite, colour, (radius, radius), radius)
+				by_size.append(sprite)
+			sprites.append(by_size)
+		return sprites
+
+	def clear(self):
+		"""Remove every particle"""
+		self.count = 0
+
+	def emit(self, x, y, colour, count=20):
+		"""
+		Spawn up to count particles at (x, y); x and y may be scalars or arrays of length count.
+		Particles that do not fit in the pool are dropped.
+		"""
+		n = min(count, self.capacity - self.count)
+		if n <= 0:
+			return
+		start, end = self.count, self.count + n
+		angle = 2 * np.pi * np.random.random(n)
+		speed = 2 + 3 * np.random.random(n)
+		self.x[start:end] = np.broadcast_to(x, (count,))[:n]
+		self.y[start:end] = np.broadcast_to(y, (count,))[:n]
+		self.dx[start:end] = np.cos(angle) * speed
+		self.dy[start:end] = np.sin(angle) * speed - 2  # Initial upward velocity
+		self.size[start:end] = np.rint(MIN_SIZE + np.random.random(n) * (MAX_SIZE - MIN_SIZE))
+		self.life[start:end] = 30 + np.random.randint(0, 21, n)
+		self.colour[start:end] = self.palette.index(colour)
+		self.count = end
+
+	def update(self):
+		"""Advance every particle one frame and cull the expired ones"""
+		n = self.count
+		if n == 0:
+			return
+		self.life[:n] -= 1
+		alive = np.flatnonzero(self.life[:n] > 0)
+		m = len(alive)
+		if m < n:
+			for arr in (self.x, self.y, self.dx, self.dy, self.life, self.size, self.colour):
+				arr[:m] = arr[alive]
+		self.x[:m] += self.dx[:m]
+		self.y[:m] += self.dy[:m]
+		self.dy[:m] += GRAVITY
+		self.count = m
+
+	def draw(self, surface):
+		"""Blit every particle's pre-rendered sprite in a single batch"""
+		n = self.count
+		if n == 0:
+			return
+		sizes = self.size[:n].tolist()
+		left = (self.x[:n] - self.size[:n]).astype(np.int32).tolist()
+		top = (self.y[:n] - self.size[:n]).astype(np.int32).tolist()
+		sprites = self.sprites
+		surface.blits(
+			[(sprites[c][s], (px, py)) for c, s, px, py in zip(self.colour[:n].tolist(), sizes, left, top)],
+			doreturn=False
+		)
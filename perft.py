@@ -0,0 +1,196 @@
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import connect_four as cf
+import bitboard as bb
+
+# Perft counts the game tree to a fixed depth: nodes are the positions exactly depth plies below the
+# start, wins and draws the games that end (and are not expanded further) within depth plies.
+# A move generator change that alters the tree changes these counts.
+
+
+def perft_list(board, depth):
+	"""
+	Returns (nodes, wins, draws) below a non-terminal list board using actions/result/winner/player.
+	"""
+	nodes = wins = draws = 0
+	for action in cf.actions(board):
+		child = cf.result(board, action)
+		ended = True
+		if cf.winner(child) is not None:
+			wins += 1
+		elif cf.player(child) is None:
+			draws += 1
+		else:
+			ended = False
+		if depth == 1:
+			nodes += 1
+		elif not ended:
+			n, w, d = perft_list(child, depth - 1)
+			nodes += n
+			wins += w
+			draws += d
+	return nodes, wins, draws
+
+
+def perft_bitboard(current, mask, moves, depth):
+	"""
+	Returns (nodes, wins, draws) below a non-terminal bitboard position.
+	"""
+	nodes = wins = draws = 0
+	for col in bb.legal_columns(mask):
+		ended = True
+		if bb.is_winning_move(current, mask, col):
+			wins += 1
+		elif moves + 1 == bb.CELLS:
+			draws += 1
+		else:
+			ended = False
+		if depth == 1:
+			nodes += 1
+		elif not ended:
+			n, w, d = perft_bitboard(*bb.play(current, mask, col), moves + 1, depth - 1)
+			nodes += n
+			wins += w
+			draws += d
+	return nodes, wins, draws
+
+
+def _run_list(moves, depth):
+	return perft_list(cf.board_from_moves(moves), depth)
+
+
+def _run_bitboard(moves, depth):
+	return perft_bitboard(*bb.from_board(cf.board_from_moves(moves)), depth)
+
+
+BACKENDS = {
+	"list": _run_list,
+	"bitboard": _run_bitboard,
+}
+
+# Reference counts {(moves, depth): (nodes, wins, draws)}. The empty-board node counts match the
+# published number of move sequences of each length (OEIS A212693).
+REFERENCE = {
+	("", 1): (7, 0, 0),
+	("", 2): (49, 0, 0),
+	("", 3): (343, 0, 0),
+	("", 4): (2401, 0, 0),
+	("", 5): (16807, 0, 0),
+	("", 6): (117649, 0, 0),
+	("", 7): (823536, 13032, 0),
+	("", 8): (5673234, 57462, 0),
+	("3324452106", 6): (111625, 2100, 0),
+	("140363653063035305114026116640", 8): (4983, 2428, 0),
+	("43531041021320211564402156622664", 10): (0, 1144, 0),
+	("45553234413205115256132643662344", 10): (2609, 2676, 2514),
+}
+
+
+def split(moves, depth, plies=2):
+	"""
+	Returns the move sequences plies below moves (stopping at finished games) and the finished
+	games met on the way as (wins, draws), so a deep count can be divided into independent tasks.
+	"""
+	tasks = [moves]
+	wins = draws = 0
+	for _ in range(min(plies, depth - 1)):
+		next_tasks = []
+		for task in tasks:
+			board = cf.board_from_moves(task)
+			for row, col in sorted(cf.actions(board)):
+				child = cf.result(board, (row, col))
+				if cf.winner(child) is not None:
+					wins += 1
+				elif cf.player(child) is None:
+					draws += 1
+				else:
+					next_tasks.append(task + str(col))
+		tasks = next_tasks
+	return tasks, depth - min(plies, depth - 1), (wins, draws)
+
+
+def perft(moves, depth, backend="list", workers=1):
+	"""
+	Returns (nodes, wins, draws) for the position after moves, counted with the named backend and
+	split across a process pool when workers > 1.
+	"""
+	if cf.terminal(cf.board_from_moves(moves)) or depth == 0:
+		return (0 if depth else 1), 0, 0
+	run = BACKENDS[backend]
+	if workers <= 1:
+		return run(moves, depth)
+	tasks, sub_depth, (wins, draws) = split(moves, depth)
+	nodes = 0
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		for n, w, d in pool.map(run, tasks, [sub_depth] * len(tasks)):
+			nodes += n
+			wins += w
+			draws += d
+	return nodes, wins, draws
+
+
+def divide(moves, depth, backend="list"):
+	"""
+	Returns {column: (nodes, wins, draws)} for each root move, for locating a disagreement.
+	"""
+	board = cf.board_from_moves(moves)
+	counts = {}
+	for row, col in sorted(cf.actions(board)):
+		child = cf.result(board, (row, col))
+		if cf.terminal(child):
+			counts[col] = (int(depth == 1), int(cf.winner(child) is not None), int(cf.winner(child) is None))
+		else:
+			counts[col] = (1, 0, 0) if depth == 1 else perft(moves + str(col), depth - 1, backend)
+	return counts
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Count the game tree to a fixed depth and cross-check board backends")
+	parser.add_argument("--moves", default="", help="columns (0-6) played from the empty board")
+	parser.add_argument("--depth", type=int, default=6, help="count depths 1..DEPTH")
+	parser.add_argument("--backends", default=",".join(BACKENDS), help=f"comma-separated, from {', '.join(BACKENDS)}")
+	parser.add_argument("--workers", type=int, default=1, help="processes to split each count across")
+	parser.add_argument("--divide", action="store_true", help="print per-root-move counts at DEPTH")
+	args = parser.parse_args()
+
+	backends = args.backends.split(",")
+	for name in backends:
+		if name not in BACKENDS:
+			parser.error(f"unknown backend {name!r}")
+
+	if args.divide:
+		for name in backends:
+			for col, (nodes, wins, draws) in divide(args.moves, args.depth, name).items():
+				print(f"{name:<10}{col}: {nodes:,} nodes {wins:,} wins {draws:,} draws")
+		return
+
+	mismatches = 0
+	checked = False
+	for depth in range(1, args.depth + 1):
+		counts = {}
+		for name in backends:
+			start = time.perf_counter()
+			counts[name] = perft(args.moves, depth, name, args.workers)
+			seconds = time.perf_counter() - start
+			nodes, wins, draws = counts[name]
+			print(f"{name:<10}depth {depth:>2}  nodes {nodes:>12,}  wins {wins:>9,}  draws {draws:>7,}  "
+				f"{seconds:8.3f}s  {nodes / seconds if seconds > 0 else 0:>12,.0f} n/s")
+		expected = REFERENCE.get((args.moves, depth))
+		checked = checked or expected is not None
+		for name, count in counts.items():
+			if expected is not None and count != expected:
+				print(f"MISMATCH {name} depth {depth}: {count} != reference {expected}")
+				mismatches += 1
+			elif count != counts[backends[0]]:
+				print(f"MISMATCH {name} depth {depth}: {count} != {backends[0]} {counts[backends[0]]}")
+				mismatches += 1
+	if mismatches:
+		sys.exit(1)
+	print("all backends agree" + (" with the reference counts" if checked else ""))
+
+
+if __name__ == '__main__':
+	main()
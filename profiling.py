@@ -0,0 +1,160 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import argparse
+import threading
+import contextlib
+from collections import Counter
+
+import connect_four as cf
+
+# Functions whose share of the search time is reported, as (module file, function name)
+HOT_FUNCTIONS = [
+	("connect_four.py", "winner"),
+	("connect_four.py", "heuristic"),
+	("connect_four.py", "heuristic_terms"),
+	("connect_four.py", "makes_four"),
+	("connect_four.py", "tactical_moves"),
+	("connect_four.py", "max_value"),
+	("connect_four.py", "min_value"),
+	("connect_four.py", "evaluate"),
+	("connect_four.py", "check_budget"),
+	("connect_four.py", "result"),
+	("connect_four.py", "actions"),
+	("connect_four.py", "player"),
+	("connect_four.py", "terminal"),
+	("connect_four.py", "utility"),
+	("threats.py", "static_score"),
+	("threats.py", "analyse"),
+	("threats.py", "odd_columns"),
+	("bitboard.py", "from_board"),
+	("bitboard.py", "alignment"),
+	("bitboard.py", "winning_cells"),
+	("utils.py", "check_win_sequence"),
+	("utils.py", "score_action_position"),
+	("utils.py", "count_empty_places"),
+]
+
+
+class StackSampler:
+	"""
+	Samples the call stack of one thread at a fixed interval and counts collapsed stacks
+	("outer;inner;leaf count" lines, the input format of flamegraph.pl and speedscope).
+	"""
+
+	def __init__(self, interval=0.001, thread_id=None):
+		self.interval = interval
+		self.thread_id = threading.get_ident() if thread_id is None else thread_id
+		self.stacks = Counter()
+		self._stop = threading.Event()
+		self._thread = None
+		self._switch_interval = None
+
+	def start(self):
+		# let the sampler thread get the GIL about as often as it wants to sample
+		self._switch_interval = sys.getswitchinterval()
+		sys.setswitchinterval(min(self._switch_interval, self.interval))
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+		self._thread.join()
+		sys.setswitchinterval(self._switch_interval)
+
+	def _run(self):
+		while not self._stop.wait(self.interval):
+			frame = sys._current_frames().get(self.thread_id)
+			stack = []
+			while frame is not None:
+				code = frame.f_code
+				stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+				frame = frame.f_back
+			if stack:
+				self.stacks[";".join(reversed(stack))] += 1
+
+	def write(self, path):
+		with open(path, "w") as f:
+			for stack, count in self.stacks.most_common():
+				f.write(f"{stack} {count}\n")
+
+
+def summarize(stats):
+	"""
+	Returns [(label, calls, tottime, cumtime)] for HOT_FUNCTIONS plus the remaining time,
+	and the total profiled time.
+	"""
+	total = stats.total_tt
+	rows = []
+	accounted = 0.0
+	for (filename, _, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+		if (os.path.basename(filename), name) in HOT_FUNCTIONS:
+			rows.append((f"{os.path.basename(filename)[:-3]}.{name}", calls, tottime, cumtime))
+			accounted += tottime
+	rows.sort(key=lambda row: row[2], reverse=True)
+	rows.append(("(everything else)", 0, total - accounted, total - accounted))
+	return rows, total
+
+
+def format_summary(rows, total):
+	lines = [f"{'function':<34}{'calls':>10}{'self s':>10}{'self %':>8}{'cum s':>10}"]
+	for label, calls, tottime, cumtime in rows:
+		share = tottime / total * 100 if total else 0.0
+		lines.append(f"{label:<34}{calls:>10,}{tottime:>10.3f}{share:>7.1f}%{cumtime:>10.3f}")
+	lines.append(f"{'total':<34}{'':>10}{total:>10.3f}")
+	return "\n".join(lines)
+
+
+def profile_call(func, *args, output=None, sample_interval=0.001, quiet=True, **kwargs):
+	"""
+	Runs func(*args, **kwargs) under cProfile and a stack sampler and prints the hot-function summary.
+	With output (a path prefix) writes output.pstats and output.collapsed. Returns func's result.
+	"""
+	profiler = cProfile.Profile()
+	sampler = StackSampler(sample_interval) if output else None
+	if sampler:
+		sampler.start()
+	start = time.perf_counter()
+	try:
+		with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+			profiler.enable()
+			try:
+				res = func(*args, **kwargs)
+			finally:
+				profiler.disable()
+	finally:
+		if sampler:
+			sampler.stop()
+	elapsed = time.perf_counter() - start
+
+	stats = pstats.Stats(profiler)
+	rows, total = summarize(stats)
+	print(f"Profiled {getattr(func, '__name__', func)} in {elapsed:.3f}s wall time")
+	print(format_summary(rows, total))
+	if output:
+		stats.dump_stats(output + ".pstats")
+		sampler.write(output + ".collapsed")
+		print(f"Wrote {output}.pstats and {output}.collapsed")
+	return res
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Profile a single minimax search")
+	parser.add_argument("--moves", default="", help="columns (0-6) played from the empty board")
+	parser.add_argument("--difficulty", default=None, choices=list(cf.DIFFICULTIES))
+	parser.add_argument("-o", "--output", default=None, help="path prefix for .pstats and .collapsed files")
+	parser.add_argument("--interval", type=float, default=0.001, help="stack sampling interval in seconds")
+	args = parser.parse_args()
+
+	board = cf.board_from_moves(args.moves)
+	(score, move), depth, positions = profile_call(
+		cf.minimax, board, args.difficulty, output=args.output, sample_interval=args.interval
+	)
+	print(f"move {move} score {score} depth {depth} positions {positions:,}")
+
+
+if __name__ == '__main__':
+	main()
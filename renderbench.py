@@ -0,0 +1,69 @@
+import os
+import random
+import argparse
+
+# Render off-screen: the benchmark must run without a display or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import connect_four as cf
+from runner import ConnectFourGame, FrameTimer
+
+
+def render_frame(game):
+	"""Render one frame of the current game state the way ConnectFourGame.run() does"""
+	game.frame_timer.start_frame()
+	game.draw_board()
+	if game.game_over:
+		game.handle_game_over()
+	else:
+		game.draw_turn_indicator()
+	game.update_particles()
+	game.present()
+
+
+def play_scripted_game(game, rng, idle_frames):
+	"""
+	Play one game of random legal moves through game.make_move() (including the drop animation),
+	rendering idle_frames static frames after every move and once the game is over.
+	"""
+	game.reset_game()
+	game.user = cf.PLAYER1
+	while not game.game_over:
+		col = rng.choice([col for _, col in cf.actions(game.board)])
+		game.make_move(col, cf.player(game.board))
+		for _ in range(idle_frames):
+			render_frame(game)
+	for _ in range(idle_frames * 4):
+		render_frame(game)
+
+
+def run(games=3, idle_frames=5, overlay=False, seed=0):
+	"""
+	Drives ConnectFourGame through scripted games and returns the FrameTimer summary (ms per frame).
+	"""
+	game = ConnectFourGame(show_frame_timing=overlay)
+	game.fps = 0  # don't cap the frame rate
+	game.frame_timer = FrameTimer(fps=0, window=1000000)
+	rng = random.Random(seed)
+	for _ in range(games):
+		play_scripted_game(game, rng, idle_frames)
+	return game.frame_timer.summary()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Headless render benchmark for runner.ConnectFourGame")
+	parser.add_argument("--games", type=int, default=3, help="scripted random games to play")
+	parser.add_argument("--idle-frames", type=int, default=5, help="static frames rendered after each move")
+	parser.add_argument("--overlay", action="store_true", help="include the frame timing overlay")
+	parser.add_argument("--seed", type=int, default=0)
+	args = parser.parse_args()
+
+	summary = run(args.games, args.idle_frames, args.overlay, args.seed)
+	print(f"frames {summary['frames']:,}  mean {summary['mean']:.2f} ms  p50 {summary['p50']:.2f} ms  "
+		f"p95 {summary['p95']:.2f} ms  max {summary['max']:.2f} ms  ({1000 / summary['mean']:,.0f} frames/s)")
+	print("per frame: " + "  ".join(f"{phase} {ms:.2f} ms" for phase, ms in summary["phases"].items()))
+
+
+if __name__ == '__main__':
+	main()
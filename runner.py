@@ -1,21 +1,146 @@
-import pygame
-import sys
 import time
-import math
-import connect_four as cf
+
+_IMPORT_START = time.perf_counter()
+
+import os
+import sys
+import csv
+import json
 import random
+from collections import deque
+from functools import cached_property
+
+import numpy as np
+import pygame
+import connect_four as cf
+import utils
+from particles import ParticlePool
+
+# Fields recorded for every AI move (see ConnectFourGame.record_ai_move)
+LATENCY_FIELDS = ["game", "move", "ply", "empty", "column", "depth", "nodes", "search_time", "wall_time", "nps"]
+
+
+def _fill_samples(arr, wave):
+	"""Write a mono waveform into a (possibly multi-channel) sndarray view"""
+	wave = wave.astype(arr.dtype)
+	if arr.ndim == 2:
+		arr[:len(wave)] = wave[:, np.newaxis]
+	else:
+		arr[:len(wave)] = wave
+
+
+def export_latencies(path, rows):
+	"""Append per-move latency rows to a .csv (header written once) or a JSON-lines file"""
+	if path.endswith(".csv"):
+		new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+		with open(path, "a", newline="") as f:
+			writer = csv.DictWriter(f, fieldnames=LATENCY_FIELDS)
+			if new_file:
+				writer.writeheader()
+			writer.writerows(rows)
+	else:
+		with open(path, "a") as f:
+			for row in rows:
+				f.write(json.dumps(row) + "\n")
+
+
+class FrameTimer:
+	"""
+	Rolling per-frame timings split into phases (events, AI, draw, flip) plus the interval
+	between frame starts, used for the frame timing overlay and the headless render benchmark.
+	"""
+	PHASES = ("events", "ai", "draw", "flip")
+	HISTOGRAM_EDGES = (2, 4, 8, 16, 33)  # ms; the last bucket holds everything slower
+
+	def __init__(self, fps=60, window=120):
+		self.budget = 1 / fps if fps else None
+		self.frames = deque(maxlen=window)  # (frame seconds, {phase: seconds})
+		self.intervals = deque(maxlen=window)
+		self.count = 0
+		self.dropped = 0
+		self._start = None
+		self._last_start = None
+		self._mark = None
+		self._phases = None
+
+	def start_frame(self):
+		now = time.perf_counter()
+		if self._last_start is not None:
+			interval = now - self._last_start
+			self.intervals.append(interval)
+			if self.budget and interval > 1.5 * self.budget:
+				self.dropped += 1
+		self._start = self._last_start = self._mark = now
+		self._phases = dict.fromkeys(self.PHASES, 0.0)
+
+	def mark(self, phase):
+		"""Charge the time since the previous mark to phase"""
+		if self._start is None:
+			return
+		now = time.perf_counter()
+		self._phases[phase] += now - self._mark
+		self._mark = now
+
+	def end_frame(self):
+		if self._start is None:
+			return
+		self.frames.append((time.perf_counter() - self._start, self._phases))
+		self.count += 1
+		self._start = None
+
+	def fps(self):
+		total = sum(self.intervals)
+		return len(self.intervals) / total if total else 0.0
+
+	def histogram(self):
+		"""Returns the number of frames in the window falling in each HISTOGRAM_EDGES bucket"""
+		counts = [0] * (len(self.HISTOGRAM_EDGES) + 1)
+		for frame, _ in self.frames:
+			ms = frame * 1000
+			counts[next((i for i, edge in enumerate(self.HISTOGRAM_EDGES) if ms < edge), -1)] += 1
+		return counts
+
+	def summary(self):
+		"""Returns frame time statistics (ms) over the window"""
+		times = [frame * 1000 for frame, _ in self.frames]
+		if not times:
+			return {}
+		n = len(times)
+		return {
+			"frames": n,
+			"mean": sum(times) / n,
+			"p50": utils.percentile(times, 50),
+			"p95": utils.percentile(times, 95),
+			"max": max(times),
+			"phases": {phase: sum(p[phase] for _, p in self.frames) * 1000 / n for phase in self.PHASES},
+		}
 
 
 class ConnectFourGame:
-	def __init__(self):
+	def __init__(self, show_startup_timing=False, difficulty=None, show_frame_timing=False, archive=None,
+			latency_log=None):
+		self.show_startup_timing = show_startup_timing
+		self.latency_log = latency_log
+		self.show_frame_timing = show_frame_timing
+		self.difficulty = difficulty
+		self.archive = None
+		if archive is not None:
+			from archive import GameArchive
+			self.archive = GameArchive(archive)
+		self.startup_timings = []
+		self._startup_mark = _IMPORT_START
+		self._record_startup_phase("imports")
+
 		pygame.init()
 		pygame.display.set_caption("Connect Four")
+		self._record_startup_phase("pygame init")
 
 		# Game settings
 		self.square_size = 100
 		self.animation_speed = 15  # pixels per frame
 		self.fps = 60
 		self.clock = pygame.time.Clock()
+		self.frame_timer = FrameTimer(self.fps)
 
 		# Board dimensions
 		self.columns = cf.COLUMNS
@@ -42,26 +167,28 @@ class ConnectFourGame:
 		# Setup display
 		self.screen = pygame.display.set_mode(self.size)
 		pygame.display.set_icon(self.create_icon())
+		self._record_startup_phase("display")
 
-		# Load fonts
-		self.title_font = pygame.font.SysFont("arial", 64, bold=True)
-		self.large_font = pygame.font.SysFont("arial", 42, bold=True)
-		self.medium_font = pygame.font.SysFont("arial", 28)
-		self.small_font = pygame.font.SysFont("arial", 22)
+		# Fonts are loaded lazily on first use (see the *_font properties)
 
 		# Game state
 		self.user = None
 		self.board = cf.initial_state()
+		self.move_history = []  # columns played this game
+		self.move_latencies = []  # one LATENCY_FIELDS dict per AI move this game
+		self.game_number = 1
+		self.game_saved = False
 		self.ai_thinking = False
 		self.game_over = False
 		self.winner = None
 		self.hover_col = None
 		self.dropping_piece = False
 		self.last_ai_move = None
-		self.particles = []
+		self.particles = ParticlePool((self.red, self.yellow))
 		self.message = None
 		self.drop_sound = self.generate_drop_sound()
 		self.win_sound = self.generate_win_sound()
+		self._record_startup_phase("sounds")
 		self.ai_stats = {
 			"moves": 0,
 			"thinking_time": 0.0,
@@ -72,6 +199,41 @@ class ConnectFourGame:
 			"total_positions": 0
 		}
 
+	def _record_startup_phase(self, phase):
+		"""Record the time spent in a startup phase since the previous one"""
+		now = time.perf_counter()
+		self.startup_timings.append((phase, now - self._startup_mark))
+		self._startup_mark = now
+
+	def print_startup_timings(self):
+		"""Print the time-to-first-frame breakdown by phase"""
+		total = sum(elapsed for _, elapsed in self.startup_timings)
+		print("Startup timings (time to first frame):")
+		for phase, elapsed in self.startup_timings:
+			print(f"  {phase:<14}{elapsed * 1000:8.1f} ms")
+		print(f"  {'total':<14}{total * 1000:8.1f} ms")
+
+	# SysFont scans the installed system fonts, so each font is only looked up when first rendered
+	@cached_property
+	def title_font(self):
+		return pygame.font.SysFont("arial", 64, bold=True)
+
+	@cached_property
+	def large_font(self):
+		return pygame.font.SysFont("arial", 42, bold=True)
+
+	@cached_property
+	def medium_font(self):
+		return pygame.font.SysFont("arial", 28)
+
+	@cached_property
+	def small_font(self):
+		return pygame.font.SysFont("arial", 22)
+
+	@cached_property
+	def tiny_font(self):
+		return pygame.font.SysFont("arial", 15)
+
 	def create_icon(self):
 		"""Create a simple game icon"""
 		icon = pygame.Surface((32, 32))
@@ -88,11 +250,13 @@ class ConnectFourGame:
 		sound = pygame.mixer.Sound(buffer=bytes([128] * 4000))
 		arr = pygame.sndarray.samples(sound)
 
-		for i in range(min(4000, len(arr))):
-			if i < 1000:
-				arr[i] = int(32767 * math.sin(i * 0.03) * (1 - i / 1000))
-			else:
-				arr[i] = int(16383 * math.sin(i * 0.06) * (1 - (i - 1000) / 3000))
+		i = np.arange(min(4000, len(arr)))
+		wave = np.where(
+			i < 1000,
+			32767 * np.sin(i * 0.03) * (1 - i / 1000),
+			16383 * np.sin(i * 0.06) * (1 - (i - 1000) / 3000)
+		)
+		_fill_samples(arr, wave)
 		return sound
 
 	@staticmethod
@@ -101,11 +265,9 @@ class ConnectFourGame:
 		sound = pygame.mixer.Sound(buffer=bytes([128] * 8000))
 		arr = pygame.sndarray.samples(sound)
 
-		for i in range(min(8000, len(arr))):
-			if i < 4000:
-				arr[i] = int(20000 * math.sin(i * 0.02) * (1 - i / 8000))
-			else:
-				arr[i] = int(20000 * math.sin(i * 0.03) * (1 - i / 8000))
+		i = np.arange(min(8000, len(arr)))
+		wave = 20000 * np.sin(i * np.where(i < 4000, 0.02, 0.03)) * (1 - i / 8000)
+		_fill_samples(arr, wave)
 		return sound
 
 	@staticmethod
@@ -249,10 +411,7 @@ class ConnectFourGame:
 			pygame.draw.circle(self.screen, self.white, (x, y), int(self.square_size * 0.45), width=2)
 
 		# Draw particles
-		for particle in self.particles:
-			pygame.draw.circle(self.screen, particle['color'],
-								(particle['x'], particle['y']),
-								particle['size'])
+		self.particles.draw(self.screen)
 
 		# Draw the sidebar content
 		self.draw_sidebar()
@@ -310,6 +469,13 @@ class ConnectFourGame:
 		if self.ai_stats['positions_per_second'] > 0:
 			stats.append(("Positions/second:", f"{self.ai_stats['positions_per_second']:,.0f}"))
 
+		# Latency distribution of this game's AI moves
+		if self.move_latencies:
+			times = [row["wall_time"] for row in self.move_latencies]
+			stats.append(("Latency p50:", f"{utils.percentile(times, 50):.2f}s"))
+			stats.append(("Latency p95:", f"{utils.percentile(times, 95):.2f}s"))
+			stats.append(("Latency max:", f"{max(times):.2f}s"))
+
 		for label, value in stats:
 			# Label in white
 			label_surface = self.small_font.render(label, True, self.white)
@@ -356,32 +522,52 @@ class ConnectFourGame:
 					time.sleep(0.2)
 					self.reset_game()
 
+	def draw_frame_timing(self):
+		"""Draw the frame timing overlay: frame time, FPS, phase split and a frame time histogram"""
+		timer = self.frame_timer
+		summary = timer.summary()
+		if not summary:
+			return
+		panel = pygame.Surface((260, 150), pygame.SRCALPHA)
+		panel.fill((0, 0, 0, 190))
+		phases = summary["phases"]
+		lines = [
+			f"frame {summary['mean']:.1f} ms (p95 {summary['p95']:.1f}, max {summary['max']:.1f})",
+			f"{timer.fps():.0f} FPS, {timer.dropped} dropped",
+			"  ".join(f"{phase} {phases[phase]:.1f}" for phase in timer.PHASES),
+		]
+		for i, line in enumerate(lines):
+			panel.blit(self.tiny_font.render(line, True, self.white), (8, 6 + i * 18))
+
+		# Histogram of the frame times in the window
+		counts = timer.histogram()
+		labels = [f"<{edge}" for edge in timer.HISTOGRAM_EDGES] + [f">{timer.HISTOGRAM_EDGES[-1]}"]
+		peak = max(counts) or 1
+		bar_width = 240 // len(counts)
+		for i, (count, label) in enumerate(zip(counts, labels)):
+			height = int(50 * count / peak)
+			x = 10 + i * bar_width
+			color = self.red if i == len(counts) - 1 else self.gray
+			pygame.draw.rect(panel, color, (x, 115 - height, bar_width - 6, height))
+			panel.blit(self.tiny_font.render(label, True, self.light_gray), (x, 120))
+		self.screen.blit(panel, (10, 10))
+
+	def present(self):
+		"""Draw the frame timing overlay if enabled, flip the display and close the frame's timing"""
+		if self.show_frame_timing:
+			self.draw_frame_timing()
+		self.frame_timer.mark("draw")
+		pygame.display.flip()
+		self.frame_timer.mark("flip")
+		self.frame_timer.end_frame()
+
 	def update_particles(self):
 		"""Update particle positions and lifetimes"""
-		new_particles = []
-		for particle in self.particles:
-			particle['life'] -= 1
-			if particle['life'] > 0:
-				particle['x'] += particle['dx']
-				particle['y'] += particle['dy']
-				particle['dy'] += 0.2  # Gravity
-				new_particles.append(particle)
-		self.particles = new_particles
+		self.particles.update()
 
 	def create_particles(self, x, y, color, count=20):
-		"""Create celebration particles at position"""
-		for _ in range(count):
-			angle = 2 * math.pi * random.random()
-			speed = 2 + 3 * random.random()
-			self.particles.append({
-				'x': x,
-				'y': y,
-				'dx': math.cos(angle) * speed,
-				'dy': math.sin(angle) * speed - 2,  # Initial upward velocity
-				'color': color,
-				'size': 2 + random.random() * 4,
-				'life': 30 + random.randint(0, 20)
-			})
+		"""Create celebration particles at position (x and y may be arrays of length count)"""
+		self.particles.emit(x, y, color, count)
 
 	def animate_piece_drop(self, col, row, player):
 		"""Animate a piece dropping into place"""
@@ -392,6 +578,9 @@ class ConnectFourGame:
 		self.drop_y = -self.square_size
 		self.target_y = 0
 
+		# Close the frame that started the move; every animation step is timed as its own frame
+		self.frame_timer.end_frame()
+		self.frame_timer.start_frame()
 		while self.drop_y < self.target_y:
 			self.drop_y += self.animation_speed
 			if self.drop_y >= self.target_y:
@@ -404,8 +593,9 @@ class ConnectFourGame:
 			if not self.game_over:
 				self.draw_turn_indicator()
 
-			pygame.display.flip()
+			self.present()
 			self.clock.tick(self.fps)
+			self.frame_timer.start_frame()
 
 		# Animation complete
 		self.dropping_piece = False
@@ -599,15 +789,46 @@ class ConnectFourGame:
 
 		return False
 
+	def save_game(self):
+		"""Append the current game's moves to the archive and its AI move latencies to the latency log (once per game)"""
+		if self.game_saved or not self.move_history:
+			return
+		self.game_saved = True
+		if self.archive is not None:
+			self.archive.append(self.move_history)
+		if self.latency_log is not None and self.move_latencies:
+			export_latencies(self.latency_log, self.move_latencies)
+
+	def record_ai_move(self, move, depth, nodes, search_time, wall_time):
+		"""Record the latency and search statistics of one AI move"""
+		self.move_latencies.append({
+			"game": self.game_number,
+			"move": len(self.move_latencies) + 1,
+			"ply": len(self.move_history),
+			"empty": utils.count_empty_places(self.board),
+			"column": move[1] if move else None,
+			"depth": depth,
+			"nodes": nodes,
+			"search_time": round(search_time, 4),
+			"wall_time": round(wall_time, 4),
+			"nps": round(nodes / search_time) if search_time > 0 else 0,
+		})
+
 	def reset_game(self):
 		"""Reset the game state for a new game"""
+		self.save_game()
 		self.user = None
 		self.board = cf.initial_state()
+		self.move_history = []
+		self.move_latencies = []
+		if self.game_saved:
+			self.game_number += 1
+		self.game_saved = False
 		self.ai_thinking = False
 		self.game_over = False
 		self.winner = None
 		self.last_ai_move = None
-		self.particles = []
+		self.particles.clear()
 		self.message = None
 		# Reset AI stats
 		self.ai_stats = {
@@ -646,38 +867,44 @@ class ConnectFourGame:
 
 		# Update the board
 		self.board = cf.result(self.board, (row, col))
+		self.move_history.append(col)
 
 		# Check for win condition
 		win = cf.winner(self.board)
 		if win or cf.terminal(self.board):
 			self.game_over = True
 			self.winner = win
+			self.save_game()
 			if win:
 				self.win_sound.play()
 				# Create winning particles
 				color = self.red if win == cf.PLAYER1 else self.yellow
-				for _ in range(50):
-					self.create_particles(
-						random.randint(0, self.width),
-						random.randint(0, self.height),
-						color
-					)
+				self.create_particles(
+					np.random.randint(0, self.width + 1, 50).repeat(20),
+					np.random.randint(0, self.height + 1, 50).repeat(20),
+					color,
+					count=1000
+				)
 
 		return True
 
 	def run(self):
 		"""Main game loop"""
-		import time  # For AI thinking time measurement
 		running = True
+		first_frame = True
 
 		while running:
 			self.clock.tick(self.fps)
+			self.frame_timer.start_frame()
 
 			# Process events
 			for event in pygame.event.get():
 				if event.type == pygame.QUIT:
 					running = False
 
+				if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+					self.show_frame_timing = not self.show_frame_timing
+
 				if event.type == pygame.MOUSEMOTION:
 					# Track mouse for column highlighting
 					if not self.game_over and self.user:
@@ -709,6 +936,7 @@ class ConnectFourGame:
 									if 0 <= col < self.columns:
 										self.message = "Column is full! Try another column."
 										self.message_time = time.time()
+			self.frame_timer.mark("events")
 
 			# Game states
 			if not self.user:
@@ -725,7 +953,8 @@ class ConnectFourGame:
 					self.ai_thinking = True
 					self.draw_board()
 					self.draw_turn_indicator()
-					pygame.display.flip()
+					self.present()
+					self.frame_timer.start_frame()
 
 					# Measure AI thinking time
 					start_time = time.time()
@@ -734,12 +963,15 @@ class ConnectFourGame:
 					pygame.time.delay(750)
 
 					# Get AI move
-					res = cf.minimax(self.board)
+					search_start = time.perf_counter()
+					res = cf.minimax(self.board, self.difficulty)
+					search_time = time.perf_counter() - search_start
 					move = res[0][1]
 					positions_in_this_move = res[2]  # Path cost is positions evaluated
 
 					# Update AI stats
 					ai_time = time.time() - start_time
+					self.record_ai_move(move, res[1], positions_in_this_move, search_time, ai_time)
 					self.ai_stats["moves"] += 1
 					self.ai_stats["depth"] = res[1]
 					self.ai_stats["current_move_positions"] = positions_in_this_move
@@ -759,6 +991,7 @@ class ConnectFourGame:
 						)
 
 					self.ai_thinking = False
+					self.frame_timer.mark("ai")
 
 					if move:
 						row, col = move
@@ -778,12 +1011,30 @@ class ConnectFourGame:
 					pass
 
 			# Update display
-			pygame.display.flip()
+			self.present()
+
+			if first_frame:
+				first_frame = False
+				self._record_startup_phase("first frame")
+				if self.show_startup_timing:
+					self.print_startup_timings()
 
+		self.save_game()
 		pygame.quit()
 		sys.exit()
 
 
 if __name__ == '__main__':
-	game = ConnectFourGame()
+	difficulty = None
+	if "--difficulty" in sys.argv[:-1]:
+		difficulty = sys.argv[sys.argv.index("--difficulty") + 1]
+		if difficulty not in cf.DIFFICULTIES:
+			sys.exit(f"Unknown difficulty {difficulty!r}; choose from {', '.join(cf.DIFFICULTIES)}")
+	game = ConnectFourGame(
+		show_startup_timing="--startup-timing" in sys.argv,
+		difficulty=difficulty,
+		show_frame_timing="--frame-timing" in sys.argv,
+		archive=sys.argv[sys.argv.index("--archive") + 1] if "--archive" in sys.argv[:-1] else None,
+		latency_log=sys.argv[sys.argv.index("--latency-log") + 1] if "--latency-log" in sys.argv[:-1] else None
+	)
 	game.run()
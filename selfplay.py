@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import random
+import struct
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+import connect_four as cf
+from batch import init_worker
+
+# One fixed-size record per position: position key, chosen column, search score and final result
+# (score and result are from PLAYER1's point of view; result is 1, 0 or -1).
+RECORD = struct.Struct("<Qbhb")
+RECORD_DTYPE = np.dtype([("key", "<u8"), ("move", "i1"), ("score", "<i2"), ("result", "i1")])
+SHARD_RECORDS = 1 << 20
+PROGRESS_FILE = "progress.json"
+SEEN_FILE = "seen-keys.npy"  # sorted keys of the written records, memory-mapped for deduplication
+MERGE_KEYS = 1 << 16  # new keys held in memory before they are merged into SEEN_FILE
+
+
+def play_game(seed, difficulty=None, nodes=None, random_plies=4, epsilon=0.05):
+	"""
+	Play one self-play game and return its (key, column, score, result) records.
+	The first random_plies moves, and any later move with probability epsilon, are random.
+	Positions whose budget ran out before a search depth completed (no score) are played but not recorded.
+	"""
+	rng = random.Random(seed)
+	engine = cf.Engine(difficulty, nodes=nodes, seed=seed, verbose=False)  # seeded evaluation noise
+	board = cf.initial_state()
+	positions = []
+	ply = 0
+	while not cf.terminal(board):
+		(score, move), _, _ = engine.search(board)
+		if score is not None:
+			positions.append((cf.position_key(board), move[1], max(-32768, min(32767, int(score)))))
+		if ply < random_plies or rng.random() < epsilon:
+			move = rng.choice(sorted(cf.actions(board)))
+		board = cf.result(board, move)
+		ply += 1
+	win = cf.winner(board)
+	result = 1 if win == cf.PLAYER1 else -1 if win == cf.PLAYER2 else 0
+	return [(key, column, score, result) for key, column, score in positions]
+
+
+def read_shards(directory):
+	"""Yields each shard in directory as a memory-mapped NumPy record array."""
+	for name in sorted(os.listdir(directory)):
+		if name.startswith("shard-") and name.endswith(".bin"):
+			path = os.path.join(directory, name)
+			if os.path.getsize(path) >= RECORD.size:
+				yield np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(os.path.getsize(path) // RECORD.size,))
+
+
+class ShardWriter:
+	"""
+	Appends deduplicated records to fixed-size shard files in a directory.
+	Written keys are kept as a sorted, memory-mapped array on disk (SEEN_FILE) plus a small set of
+	recent keys, so deduplication does not hold every key in RAM.
+	Reopening a directory resumes it: seen keys are rebuilt from the existing shards and
+	a torn trailing record (from an interrupted run) is truncated.
+	"""
+
+	def __init__(self, directory, shard_records=SHARD_RECORDS):
+		self.directory = directory
+		self.shard_records = shard_records
+		os.makedirs(directory, exist_ok=True)
+		self.seen = None
+		self.recent = set()
+		self.records = 0
+		self.games = 0
+		progress = os.path.join(directory, PROGRESS_FILE)
+		if os.path.exists(progress):
+			with open(progress) as f:
+				self.games = json.load(f)["games"]
+		shards = sorted(n for n in os.listdir(directory) if n.startswith("shard-") and n.endswith(".bin"))
+		for name in shards:
+			path = os.path.join(directory, name)
+			size = os.path.getsize(path)
+			if size % RECORD.size:
+				with open(path, "r+b") as f:
+					f.truncate(size - size % RECORD.size)
+		keys = [np.asarray(shard["key"]) for shard in read_shards(directory)]
+		self.records = sum(len(k) for k in keys)
+		self.save_seen(np.unique(np.concatenate(keys)) if keys else np.zeros(0, dtype=np.uint64))
+		del keys
+		self.index = len(shards) - 1 if shards else 0
+		self.file = None
+		self.in_shard = 0
+		if shards:
+			self.in_shard = os.path.getsize(os.path.join(directory, shards[-1])) // RECORD.size
+		self.open_shard()
+
+	def open_shard(self):
+		if self.file is not None:
+			self.file.close()
+		if self.in_shard >= self.shard_records:
+			self.index += 1
+			self.in_shard = 0
+		self.file = open(os.path.join(self.directory, f"shard-{self.index:05d}.bin"), "ab")
+
+	def save_seen(self, keys):
+		"""Write the sorted seen keys next to the shards and memory-map them"""
+		path = os.path.join(self.directory, SEEN_FILE)
+		tmp = os.path.join(self.directory, "seen-keys.tmp.npy")
+		np.save(tmp, keys.astype(np.uint64))
+		os.replace(tmp, path)
+		self.seen = np.load(path, mmap_mode="r")
+
+	def is_seen(self, key):
+		if key in self.recent:
+			return True
+		i = int(np.searchsorted(self.seen, np.uint64(key)))
+		return i < len(self.seen) and int(self.seen[i]) == key
+
+	def merge_seen(self):
+		"""Merge the recent keys into the sorted on-disk array"""
+		recent = np.fromiter(self.recent, dtype=np.uint64, count=len(self.recent))
+		self.save_seen(np.union1d(self.seen, recent))
+		self.recent.clear()
+
+	def write_game(self, records):
+		"""Append a game's new positions; returns the number of records written."""
+		written = 0
+		for key, column, score, result in records:
+			if self.is_seen(key):
+				continue
+			self.recent.add(key)
+			if self.in_shard >= self.shard_records:
+				self.open_shard()
+			self.file.write(RECORD.pack(key, column, score, result))
+			self.in_shard += 1
+			written += 1
+		if len(self.recent) >= MERGE_KEYS:
+			self.merge_seen()
+		self.records += written
+		self.games += 1
+		return written
+
+	def checkpoint(self):
+		"""Flush the shard and record how many games are complete"""
+		self.file.flush()
+		os.fsync(self.file.fileno())
+		tmp = os.path.join(self.directory, PROGRESS_FILE + ".tmp")
+		with open(tmp, "w") as f:
+			json.dump({"games": self.games, "records": self.records}, f)
+		os.replace(tmp, os.path.join(self.directory, PROGRESS_FILE))
+
+	def close(self):
+		self.checkpoint()
+		self.file.close()
+
+
+def generate(directory, games, workers=None, seed=0, difficulty="easy", nodes=None,
+		random_plies=4, epsilon=0.05, report_every=10.0):
+	"""
+	Play games (in total, including earlier runs in directory) across a process pool and write
+	their positions to shards. Game i always uses seed + i, so resumed runs continue the sequence.
+	"""
+	writer = ShardWriter(directory)
+	workers = workers or os.cpu_count() or 1
+	start = time.perf_counter()
+	last_report = start
+	written = 0
+	next_game = writer.games
+	# Games are written in completion order, so checkpoints only count the contiguous prefix of finished games
+	finished = {}
+	try:
+		with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+			pending = {}
+			while next_game < games or pending:
+				while next_game < games and len(pending) < workers * 2:
+					future = pool.submit(play_game, seed + next_game, difficulty, nodes, random_plies, epsilon)
+					pending[future] = next_game
+					next_game += 1
+				done, _ = wait(pending, return_when=FIRST_COMPLETED)
+				for future in done:
+					finished[pending.pop(future)] = future.result()
+				while writer.games in finished:
+					written += writer.write_game(finished.pop(writer.games))
+				now = time.perf_counter()
+				if now - last_report >= report_every:
+					writer.checkpoint()
+					rate = written / (now - start) * 3600
+					print(f"games {writer.games}/{games}  positions {writer.records:,}  "
+						f"new {written:,}  {rate:,.0f} positions/hour")
+					last_report = now
+	finally:
+		writer.close()
+	elapsed = time.perf_counter() - start
+	print(f"done: {writer.games} games, {writer.records:,} unique positions "
+		f"({written / elapsed * 3600:,.0f} positions/hour this run)")
+	return writer.records
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Generate self-play training data as binary shards")
+	parser.add_argument("directory")
+	parser.add_argument("-n", "--games", type=int, default=1000, help="total games (resumes from earlier runs)")
+	parser.add_argument("--workers", type=int, default=None)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--difficulty", default="easy", choices=list(cf.DIFFICULTIES))
+	parser.add_argument("--nodes", type=int, default=None, help="node budget per move (overrides the profile)")
+	parser.add_argument("--random-plies", type=int, default=4)
+	parser.add_argument("--epsilon", type=float, default=0.05)
+	args = parser.parse_args()
+	generate(args.directory, args.games, args.workers, args.seed, args.difficulty, args.nodes,
+		args.random_plies, args.epsilon)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import connect_four as cf
+from batch import init_worker, search
+
+
+def encode_board(board):
+	"""Returns the board as a list of row strings, top row first."""
+	return ["".join(row) for row in board]
+
+
+IPC_GRACE = 0.5  # seconds allowed on top of the search budget for pool round trips
+
+
+class ServerBusy(Exception):
+	pass
+
+
+class Session:
+	def __init__(self, game_id, difficulty=None):
+		self.id = game_id
+		self.difficulty = difficulty
+		self.board = cf.initial_state()
+		self.lock = asyncio.Lock()
+		self.last_active = time.monotonic()
+
+	def state(self):
+		win = cf.winner(self.board)
+		return {
+			"game": self.id,
+			"board": encode_board(self.board),
+			"to_move": cf.player(self.board),
+			"winner": win,
+			"over": cf.terminal(self.board)
+		}
+
+
+class GameServer:
+	"""
+	Hosts many concurrent games over a line-delimited JSON protocol on TCP.
+	Moves are validated on the event loop; AI searches run in a process pool.
+	"""
+
+	def __init__(self, workers=None, max_queue=64, max_sessions=10000, budget=5.0, idle_timeout=600.0):
+		self.workers = workers or os.cpu_count() or 1
+		self.max_queue = max_queue
+		self.max_sessions = max_sessions
+		self.budget = budget
+		self.idle_timeout = idle_timeout
+		self.sessions = {}
+		self.pending = 0
+		self.ids = itertools.count(1)
+		self.pool = None
+		self.slots = None
+
+	async def start(self, host="127.0.0.1", port=8765):
+		self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+		self.slots = asyncio.Semaphore(self.workers)
+		return await asyncio.start_server(self.handle_client, host, port)
+
+	def close(self):
+		if self.pool is not None:
+			self.pool.shutdown(wait=False, cancel_futures=True)
+
+	async def handle_client(self, reader, writer):
+		"""Serve one connection; requests on a connection are handled one at a time"""
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				try:
+					response = await self.dispatch(json.loads(line))
+				except ServerBusy as e:
+					response = {"ok": False, "error": "busy", "detail": str(e)}
+				except (ValueError, KeyError, TypeError) as e:
+					response = {"ok": False, "error": "bad_request", "detail": str(e)}
+				writer.write(json.dumps(response).encode() + b"\n")
+				await writer.drain()
+		except ConnectionError:
+			pass
+		finally:
+			writer.close()
+
+	async def dispatch(self, request):
+		op = request["op"]
+		if op == "new":
+			return await self.new_game(request.get("ai_first", False), request.get("budget"), request.get("difficulty"))
+		if op == "move":
+			return await self.move(request["game"], int(request["column"]), request.get("budget"))
+		if op == "state":
+			return {"ok": True, **self.session(request["game"]).state()}
+		if op == "close":
+			self.sessions.pop(request["game"], None)
+			return {"ok": True}
+		if op == "stats":
+			return {"ok": True, "sessions": len(self.sessions), "pending": self.pending, "workers": self.workers}
+		raise ValueError(f"Unknown op {op!r}")
+
+	def session(self, game_id):
+		session = self.sessions.get(game_id)
+		if session is None:
+			raise KeyError(f"Unknown game {game_id}")
+		return session
+
+	def expire_sessions(self):
+		cutoff = time.monotonic() - self.idle_timeout
+		for game_id in [g for g, s in self.sessions.items() if s.last_active < cutoff]:
+			del self.sessions[game_id]
+
+	async def new_game(self, ai_first=False, budget=None, difficulty=None):
+		if len(self.sessions) >= self.max_sessions:
+			self.expire_sessions()
+			if len(self.sessions) >= self.max_sessions:
+				raise ServerBusy("too many sessions")
+		if difficulty is not None and difficulty not in cf.DIFFICULTIES:
+			raise ValueError(f"Unknown difficulty {difficulty!r}")
+		session = Session(next(self.ids), difficulty)
+		self.sessions[session.id] = session
+		response = {"ok": True}
+		if ai_first:
+			async with session.lock:
+				response.update(await self.ai_move(session, budget))
+		response.update(session.state())
+		return response
+
+	async def move(self, game_id, column, budget=None):
+		session = self.session(game_id)
+		async with session.lock:
+			session.last_active = time.monotonic()
+			if cf.terminal(session.board):
+				return {"ok": False, "error": "game_over", **session.state()}
+			action = next((a for a in cf.actions(session.board) if a[1] == column), None)
+			if action is None:
+				return {"ok": False, "error": "illegal_move", **session.state()}
+			self.check_capacity()
+			session.board = cf.result(session.board, action)
+			response = {"ok": True, "move": list(action)}
+			if not cf.terminal(session.board):
+				response.update(await self.ai_move(session, budget))
+			response.update(session.state())
+			return response
+
+	def check_capacity(self):
+		"""Reject new work (before any state changes) once max_queue searches are waiting"""
+		if self.pending >= self.max_queue:
+			raise ServerBusy(f"{self.pending} searches queued")
+
+	async def ai_move(self, session, budget=None):
+		"""
+		Search the session's position in the process pool within the time budget.
+		The search itself stops at the budget; the fallback move only covers queueing and IPC delays.
+		Requests beyond max_queue waiting searches are rejected instead of queued.
+		"""
+		self.check_capacity()
+		budget = self.budget if budget is None else min(float(budget), self.budget)
+		deadline = time.monotonic() + budget
+		self.pending += 1
+		try:
+			timed_out = False
+			depth = positions = 0
+			try:
+				await asyncio.wait_for(self.slots.acquire(), budget)
+			except asyncio.TimeoutError:
+				timed_out = True
+			if not timed_out:
+				remaining = max(deadline - time.monotonic(), 0.001)
+				profile_time = cf.DIFFICULTIES[session.difficulty]["time"] if session.difficulty else None
+				time_limit = remaining if profile_time is None else min(profile_time, remaining)
+				job = functools.partial(search, session.board, session.difficulty, time_limit)
+				# The worker slot is only freed once the search really finishes, even after a timeout
+				future = asyncio.get_running_loop().run_in_executor(self.pool, job)
+				future.add_done_callback(lambda _: self.slots.release())
+				try:
+					_, move, depth, positions, _ = await asyncio.wait_for(
+						asyncio.shield(future), time_limit + IPC_GRACE
+					)
+				except asyncio.TimeoutError:
+					timed_out = True
+			if timed_out:
+				move = cf.fallback_move(session.board)
+		finally:
+			self.pending -= 1
+		session.board = cf.result(session.board, move)
+		return {"ai_move": list(move), "depth": depth, "positions": positions, "timed_out": timed_out}
+
+
+async def serve(args):
+	server = GameServer(args.workers, args.max_queue, args.max_sessions, args.budget)
+	tcp = await server.start(args.host, args.port)
+	print(f"Serving on {args.host}:{args.port} with {server.workers} search workers")
+	try:
+		async with tcp:
+			await tcp.serve_forever()
+	finally:
+		server.close()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Connect Four AI game server (line-delimited JSON over TCP)")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--workers", type=int, default=None, help="search processes (default: CPU count)")
+	parser.add_argument("--max-queue", type=int, default=64, help="searches allowed to wait before rejecting")
+	parser.add_argument("--max-sessions", type=int, default=10000)
+	parser.add_argument("--budget", type=float, default=5.0, help="maximum seconds per AI move")
+	try:
+		asyncio.run(serve(parser.parse_args()))
+	except KeyboardInterrupt:
+		pass
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,167 @@
+import sys
+import time
+import threading
+
+import utils
+import connect_four as cf
+
+HELP = """commands:
+  newgame                          start a new game and clear the search cache
+  position [startpos] [moves C..]  set the position from columns (0-6) played from the empty board
+  go [depth N] [movetime MS] [nodes N] [infinite]
+                                   search the position; prints info lines and "bestmove C"
+  stop                             stop the current search and print its best move
+  isready                          prints "readyok" (also while searching)
+  d                                show the board
+  quit                             exit"""
+
+
+def format_score(score, board):
+	"""
+	Returns the score from the side to move's point of view: "cp N" for heuristic scores,
+	"win N" / "loss N" for a proven result N plies away.
+	"""
+	if cf.player(board) == cf.PLAYER2:
+		score = -score
+	if abs(score) >= cf.WIN_SCORE - cf.ROWS * cf.COLUMNS:
+		return f"{'win' if score > 0 else 'loss'} {cf.WIN_SCORE - abs(score)}"
+	return f"cp {int(score)}"
+
+
+class TextEngine:
+	"""
+	A persistent engine process speaking a line-based text protocol on stdin/stdout, so a GUI or
+	test harness can keep one process (and its search cache) across many moves and games.
+	Searches run in a background thread so "stop" can interrupt them.
+	"""
+
+	def __init__(self, out=None):
+		self.out = out or sys.stdout
+		self.board = cf.initial_state()
+		self.engine = cf.Engine(verbose=False)
+		self.stop_event = threading.Event()
+		self.thread = None
+		self.infinite = False  # the running search only ends on stop
+		self.write_lock = threading.Lock()
+
+	def send(self, line):
+		with self.write_lock:
+			self.out.write(line + "\n")
+			self.out.flush()
+
+	def handle(self, line):
+		"""Runs one command line; returns False when the engine should exit."""
+		words = line.split()
+		if not words:
+			return True
+		command, args = words[0], words[1:]
+		if command == "quit":
+			self.stop()
+			return False
+		elif command == "isready":
+			self.send("readyok")
+		elif command == "newgame":
+			self.stop()
+			self.board = cf.initial_state()
+			self.engine.clear_cache()
+		elif command == "position":
+			self.stop()
+			self.set_position(args)
+		elif command == "go":
+			self.stop()
+			self.go(args)
+		elif command == "stop":
+			self.stop()
+		elif command == "d":
+			for row in self.board:
+				self.send(" ".join(row))
+			self.send(f"to move: {cf.player(self.board) or '-'}  winner: {cf.winner(self.board) or '-'}")
+		elif command == "help":
+			self.send(HELP)
+		else:
+			self.send(f"info string unknown command {command!r}")
+		return True
+
+	def set_position(self, args):
+		if args and args[0] == "startpos":
+			args = args[1:]
+		if args and args[0] == "moves":
+			args = args[1:]
+		board = cf.initial_state()
+		for col in "".join(args):
+			action = next((a for a in cf.actions(board) if str(a[1]) == col), None)
+			if action is None or cf.terminal(board):
+				self.send(f"info string illegal move {col}, position unchanged")
+				return
+			board = cf.result(board, action)
+		self.board = board
+
+	def go(self, args):
+		limits = {"depth": None, "movetime": None, "nodes": None}
+		infinite = False
+		i = 0
+		while i < len(args):
+			if args[i] == "infinite":
+				infinite = True
+				i += 1
+			elif args[i] in limits and i + 1 < len(args) and args[i + 1].isdigit():
+				limits[args[i]] = int(args[i + 1])
+				i += 2
+			else:
+				self.send(f"info string bad go argument {args[i]!r}")
+				return
+		if cf.terminal(self.board):
+			self.send("bestmove none")
+			return
+		depth = limits["depth"]
+		if infinite and depth is None:
+			depth = utils.count_empty_places(self.board)
+		time_limit = None if limits["movetime"] is None else limits["movetime"] / 1000
+		self.stop_event.clear()
+		self.infinite = infinite
+		self.thread = threading.Thread(
+			target=self.search, args=(self.board, depth, time_limit, limits["nodes"]), daemon=True
+		)
+		self.thread.start()
+
+	def search(self, board, depth, time_limit, nodes):
+		start = time.perf_counter()
+
+		def info(depth, score, move, positions):
+			elapsed = time.perf_counter() - start
+			nps = int(positions / elapsed) if elapsed > 0 else 0
+			self.send(
+				f"info depth {depth} score {format_score(score, board)} nodes {positions} "
+				f"nps {nps} time {int(elapsed * 1000)} pv {move[1]}"
+			)
+
+		(score, move), _, _ = self.engine.search(
+			board, depth, nodes=nodes, time_limit=time_limit, stop=self.stop_event, info=info
+		)
+		self.send(f"bestmove {move[1] if move else 'none'}")
+
+	def wait(self):
+		if self.thread is not None:
+			self.thread.join()
+			self.thread = None
+
+	def stop(self):
+		self.stop_event.set()
+		self.wait()
+
+
+def main():
+	engine = TextEngine()
+	for line in sys.stdin:
+		if not engine.handle(line):
+			break
+	else:
+		# end of input: stop a go infinite, let a bounded go finish and report its bestmove
+		if engine.infinite:
+			engine.stop()
+		else:
+			engine.wait()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,70 @@
+import connect_four as cf
+import bitboard as bb
+
+# Static threat analysis after Allis' parity rules. Rows are counted 1-6 from the bottom, so the
+# bottom row is odd. If the side that did not just move ("follower") answers every move in the same
+# column (follow-up), the cells of each column pair up and the follower gets the upper cell of every pair.
+# With an even number of empty cells in every column that is claimeven: the follower gets all empty
+# even-row cells and the side to move all empty odd-row cells.
+
+ODD_ROWS = sum(1 << (col * bb.H1 + height) for col in range(cf.COLUMNS) for height in range(0, cf.ROWS, 2))
+EVEN_ROWS = sum(1 << (col * bb.H1 + height) for col in range(cf.COLUMNS) for height in range(1, cf.ROWS, 2))
+
+UNKNOWN = 0
+FOLLOWER_SAFE = 1  # the follower cannot lose
+FOLLOWER_WINS = 2
+
+
+def odd_columns(mask):
+	"""
+	Returns the columns holding an odd number of empty cells.
+	"""
+	return [
+		col for col in range(cf.COLUMNS)
+		if (cf.ROWS - ((mask >> (col * bb.H1)) & ((1 << cf.ROWS) - 1)).bit_length()) % 2
+	]
+
+
+def analyse(current, mask):
+	"""
+	Returns FOLLOWER_WINS, FOLLOWER_SAFE or UNKNOWN for a non-terminal bitboard position, from the
+	point of view of the player who is not to move and plays follow-up:
+	- every column has an even number of empty cells (claimeven): the side to move can only complete
+	  lines through empty odd-row cells; if it has none the follower cannot lose, and wins if it has
+	  a line through empty even-row cells.
+	- exactly one column has an odd number of empty cells: there the pairs are shifted and the follower
+	  gets the odd-row cells, so a follower threat on an odd row of that column wins unless the side to
+	  move has a line through its own cells (odd rows elsewhere, even rows below the threat).
+	"""
+	empty = bb.BOARD_MASK & ~mask
+	other = current ^ mask
+	columns = odd_columns(mask)
+	if not columns:
+		if bb.alignment(current | (empty & ODD_ROWS)):
+			return UNKNOWN
+		return FOLLOWER_WINS if bb.alignment(other | (empty & EVEN_ROWS)) else FOLLOWER_SAFE
+	if len(columns) == 1:
+		column = bb.column_mask(columns[0])
+		threats = bb.winning_cells(other, mask) & column & ODD_ROWS
+		if threats:
+			below = (threats & -threats) - 1
+			mover_cells = (empty & ODD_ROWS & ~column) | (empty & EVEN_ROWS & column & below)
+			if not bb.alignment(current | mover_cells):
+				return FOLLOWER_WINS
+	return UNKNOWN
+
+
+def static_score(board, ply):
+	"""
+	Returns (score, exact) for the board at the given ply if the threat analysis decides it, None otherwise.
+	A proven win scores WIN_SCORE - (ply + empty cells), the slowest it can take (exact is True);
+	a position the follower cannot lose is an upper/lower bound of 0 (exact is False).
+	"""
+	current, mask, moves = bb.from_board(board)
+	verdict = analyse(current, mask)
+	if verdict == UNKNOWN:
+		return None
+	sign = -1 if cf.player(board) == cf.PLAYER1 else 1  # the follower's sign
+	if verdict == FOLLOWER_WINS:
+		return sign * (cf.WIN_SCORE - ply - (bb.CELLS - moves)), True
+	return 0, False
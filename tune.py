@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import connect_four as cf
+from archive import GameArchive, UNFINISHED
+from batch import init_worker
+
+# The tuned parameter vector, in the order of heuristic_terms(): open threes, threes, twos, position base
+PARAMS = ("open_three", "three", "two", "position_base")
+SPSA_SCALE = np.array([4.0, 3.0, 2.0, 2.0])  # perturbation size of each parameter (in weight units)
+
+# The largest open three, three and two counts and reach heuristic_terms() returns for quiet positions
+# (measured over random games), used to keep tuned quiet scores below the immediate-threat score
+MAX_COUNTS = np.array([4, 12, 20])
+MAX_REACH = 30
+
+
+def to_weights(theta):
+	return {name: round(float(value), 2) for name, value in zip(PARAMS, theta)}
+
+
+def to_theta(weights):
+	return np.array([weights[name] for name in PARAMS], dtype=np.float64)
+
+
+def bound(theta):
+	"""Returns theta, scaled down if a quiet position could score as much as cf.THREAT_SCORE with it"""
+	worst = MAX_COUNTS @ np.abs(theta[:3]) + abs(theta[3]) + MAX_REACH
+	limit = cf.THREAT_SCORE - 1
+	return theta if worst <= limit else theta * (limit - MAX_REACH) / (worst - MAX_REACH)
+
+
+def save_weights(path, theta):
+	with open(path, "w") as f:
+		json.dump(to_weights(bound(theta)), f, indent=2)
+
+
+def load_checkpoint(path, method):
+	if path and os.path.exists(path):
+		with open(path) as f:
+			state = json.load(f)
+		if state["method"] == method:
+			return state
+	return None
+
+
+def save_checkpoint(path, state):
+	if path:
+		tmp = path + ".tmp"
+		with open(tmp, "w") as f:
+			json.dump(state, f, indent=2)
+		os.replace(tmp, path)
+
+
+# --- self-play games -----------------------------------------------------------------------------
+
+
+def play_game(seed, depth, random_plies=4, epsilon=0.1, red=None, yellow=None):
+	"""
+	Play one depth-limited game and return its columns. red and yellow are heuristic weight dicts
+	(None for HEURISTIC_WEIGHTS); the first random_plies moves and later moves with probability
+	epsilon are random.
+	"""
+	rng = random.Random(seed)
+	engines = {
+		cf.PLAYER1: cf.Engine(weights=red, verbose=False),
+		cf.PLAYER2: cf.Engine(weights=yellow, verbose=False),
+	}
+	board = cf.initial_state()
+	moves = []
+	while not cf.terminal(board):
+		if len(moves) < random_plies or rng.random() < epsilon:
+			move = rng.choice(sorted(cf.actions(board)))
+		else:
+			(_, move), _, _ = engines[cf.player(board)].search(board, max_depth=depth)
+		board = cf.result(board, move)
+		moves.append(move[1])
+	return moves
+
+
+def generate(path, games, depth=3, workers=None, seed=0):
+	"""Append games of depth-limited self-play to the archive at path."""
+	archive = GameArchive(path)
+	with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=init_worker) as pool:
+		archive.extend(pool.map(play_game, range(seed, seed + games), [depth] * games, chunksize=4))
+	print(f"{path}: {len(archive):,} games")
+
+
+# --- Texel-style logistic fit ---------------------------------------------------------------------
+
+
+def game_terms(game):
+	"""
+	Returns [(threat, open_threes, threes, twos, reach, sign, target)] for every non-terminal position
+	of a game, where target is the game result for PLAYER1 (1, 0.5 or 0).
+	"""
+	moves, result = game
+	if result == UNFINISHED:
+		return []
+	target = (result + 1) / 2
+	rows = []
+	board = cf.initial_state()
+	for col in moves:
+		action = next(a for a in cf.actions(board) if a[1] == col)
+		board = cf.result(board, action)
+		if cf.terminal(board):
+			break
+		rows.append((*cf.heuristic_terms(board, action), target))
+	return rows
+
+
+def load_terms(path, workers=None, limit=None):
+	"""Returns the heuristic terms (n, 6) and targets (n,) of every position in the archive's games."""
+	games = []
+	for game in GameArchive(path):
+		games.append((list(game[0]), game[1]))
+		if limit is not None and len(games) >= limit:
+			break
+	with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+		rows = [row for rows in pool.map(game_terms, games, chunksize=64) for row in rows]
+	data = np.array(rows, dtype=np.float64).reshape(-1, 7)
+	return data[:, :6], data[:, 6]
+
+
+def term_matrix(terms):
+	"""Returns (x, offset): heuristic scores are x @ theta + offset."""
+	threat, counts, reach, sign = terms[:, 0], terms[:, 1:4], terms[:, 4], terms[:, 5]
+	quiet = threat == 0
+	x = np.zeros((len(terms), len(PARAMS)))
+	x[:, :3] = counts * (sign * quiet)[:, None]
+	x[:, 3] = sign * quiet
+	return x, np.where(quiet, sign * reach, threat)
+
+
+def texel_loss(x, offset, targets, theta, k):
+	predicted = 1 / (1 + np.exp(-k * (x @ theta + offset)))
+	return float(np.mean((targets - predicted) ** 2))
+
+
+def fit_k(x, offset, targets, theta):
+	"""Returns the logistic scale that best maps heuristic scores to results for theta (golden-section search)."""
+	lo, hi = 1e-5, 0.1
+	ratio = (5 ** 0.5 - 1) / 2
+	for _ in range(60):
+		a, b = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+		if texel_loss(x, offset, targets, theta, a) < texel_loss(x, offset, targets, theta, b):
+			hi = b
+		else:
+			lo = a
+	return (lo + hi) / 2
+
+
+def texel(path, iterations=50, workers=None, limit=None, checkpoint=None, output="weights.json"):
+	"""
+	Fit the heuristic weights to game results: minimise the mean squared error between the results and
+	a logistic function of the heuristic score (Levenberg-Marquardt steps, refitting the logistic scale
+	after each accepted step since reach is not weighted).
+	"""
+	start = time.perf_counter()
+	terms, targets = load_terms(path, workers, limit)
+	x, offset = term_matrix(terms)
+	print(f"{len(targets):,} positions loaded in {time.perf_counter() - start:.1f}s")
+
+	state = load_checkpoint(checkpoint, "texel")
+	if state:
+		theta, k, first, damping = np.array(state["theta"]), state["k"], state["iteration"], state["damping"]
+	else:
+		theta = to_theta(cf.HEURISTIC_WEIGHTS)
+		k = fit_k(x, offset, targets, theta)
+		first, damping = 0, 1e-3
+	loss = texel_loss(x, offset, targets, theta, k)
+	print(f"start  loss {loss:.6f}  k {k:.5f}  {to_weights(theta)}")
+	for iteration in range(first, iterations):
+		predicted = 1 / (1 + np.exp(-k * (x @ theta + offset)))
+		jacobian = (k * predicted * (1 - predicted))[:, None] * x
+		normal = jacobian.T @ jacobian
+		step = np.linalg.solve(normal + damping * np.diag(np.diag(normal) + 1e-12), jacobian.T @ (targets - predicted))
+		candidate = bound(theta + step)
+		new_loss = texel_loss(x, offset, targets, candidate, k)
+		if new_loss < loss:
+			theta, damping = candidate, damping / 3
+			k = fit_k(x, offset, targets, theta)
+			loss = texel_loss(x, offset, targets, theta, k)
+		else:
+			damping *= 4
+		print(f"iter {iteration + 1:>3}  loss {loss:.6f}  {to_weights(theta)}")
+		save_checkpoint(checkpoint, {
+			"method": "texel", "iteration": iteration + 1, "theta": theta.tolist(), "k": k, "damping": damping
+		})
+	save_weights(output, theta)
+	print(f"wrote {output}")
+	return theta
+
+
+# --- SPSA over self-play matches ------------------------------------------------------------------
+
+
+def match_game(args):
+	"""Plays one game between two weight vectors from a random opening; returns the result for red."""
+	seed, red, yellow, depth = args
+	moves = play_game(seed, depth, random_plies=4, epsilon=0.0, red=red, yellow=yellow)
+	win = cf.winner(cf.board_from_moves(moves))
+	return 1 if win == cf.PLAYER1 else -1 if win == cf.PLAYER2 else 0
+
+
+def spsa(iterations=50, pairs=8, depth=3, workers=None, seed=0, a=1.0, c=1.0, checkpoint=None,
+		output="weights.json"):
+	"""
+	Tune the heuristic weights with SPSA: each iteration perturbs all weights at once in a random
+	direction, plays theta+ against theta- in pairs of games (both colours, same opening) and steps
+	along the estimated gradient of the match score.
+	"""
+	state = load_checkpoint(checkpoint, "spsa")
+	theta = np.array(state["theta"]) if state else to_theta(cf.HEURISTIC_WEIGHTS)
+	first = state["iteration"] if state else 0
+	big_a = iterations / 10
+	with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=init_worker) as pool:
+		for iteration in range(first, iterations):
+			rng = random.Random(seed * 1000003 + iteration)  # resumed runs replay the same perturbations
+			a_k = a / (iteration + 1 + big_a) ** 0.602
+			c_k = c / (iteration + 1) ** 0.101
+			delta = np.array([rng.choice((-1, 1)) for _ in PARAMS])
+			plus = to_weights(theta + c_k * delta * SPSA_SCALE)
+			minus = to_weights(theta - c_k * delta * SPSA_SCALE)
+			openings = [rng.randrange(1 << 30) for _ in range(pairs)]
+			jobs = [(s, plus, minus, depth) for s in openings] + [(s, minus, plus, depth) for s in openings]
+			results = list(pool.map(match_game, jobs))
+			score = (sum(results[:pairs]) - sum(results[pairs:])) / (2 * pairs)  # theta+'s score in [-1, 1]
+			theta = bound(theta + a_k * score / (c_k * delta) * SPSA_SCALE)
+			print(f"iter {iteration + 1:>3}  score {score:+.2f}  {to_weights(theta)}")
+			save_checkpoint(checkpoint, {"method": "spsa", "iteration": iteration + 1, "theta": theta.tolist()})
+	save_weights(output, theta)
+	print(f"wrote {output}")
+	return theta
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Tune the heuristic() weights")
+	sub = parser.add_subparsers(dest="command", required=True)
+
+	gen = sub.add_parser("generate", help="append depth-limited self-play games to an archive")
+	gen.add_argument("archive")
+	gen.add_argument("-n", "--games", type=int, default=1000)
+	gen.add_argument("--depth", type=int, default=3)
+	gen.add_argument("--seed", type=int, default=0)
+
+	tex = sub.add_parser("texel", help="fit the weights to game results in an archive (logistic fit)")
+	tex.add_argument("archive")
+	tex.add_argument("--iterations", type=int, default=50)
+	tex.add_argument("--limit", type=int, default=None, help="use at most this many games")
+
+	sp = sub.add_parser("spsa", help="tune the weights by SPSA over self-play matches")
+	sp.add_argument("--iterations", type=int, default=50)
+	sp.add_argument("--pairs", type=int, default=8, help="game pairs per iteration")
+	sp.add_argument("--depth", type=int, default=3)
+	sp.add_argument("--seed", type=int, default=0)
+	sp.add_argument("-a", type=float, default=1.0, help="step size (in units of the perturbation size)")
+	sp.add_argument("-c", type=float, default=1.0, help="perturbation size multiplier")
+
+	for command in (gen, tex, sp):
+		command.add_argument("--workers", type=int, default=None)
+	for command in (tex, sp):
+		command.add_argument("--checkpoint", default=None, help="JSON file to save progress to and resume from")
+		command.add_argument("-o", "--output", default="weights.json", help="weight file to write")
+	args = parser.parse_args()
+
+	if args.command == "generate":
+		generate(args.archive, args.games, args.depth, args.workers, args.seed)
+	elif args.command == "texel":
+		texel(args.archive, args.iterations, args.workers, args.limit, args.checkpoint, args.output)
+	else:
+		spsa(args.iterations, args.pairs, args.depth, args.workers, args.seed, args.a, args.c,
+			args.checkpoint, args.output)
+
+
+if __name__ == '__main__':
+	main()
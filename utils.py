@@ -1,3 +1,5 @@
+import math
+
 
 def count_empty_places(board):
 	"""
@@ -43,15 +45,15 @@ def check_sloped_diagonals(board, starts, direction):
 	return None
 
 
-def score_action_position(board, action, pl):
+def score_action_position(board, action, pl, base=-8):
 	"""
 	Returns the score of the action position by counting the number of empty spaces
-	and the number of pieces of the player in all directions from the action position.
+	and the number of pieces of the player in all directions from the action position, starting from base.
 	"""
 	from connect_four import COLUMNS, ROWS
 	row, col = action
 	j: int = 1
-	i: int = -8
+	i: int = base
 	while row >= 0:
 		if board[row][col] == pl:
 			break
@@ -122,3 +124,12 @@ def score_action_position(board, action, pl):
 		i += j
 
 	return i
+
+
+def percentile(values, pct):
+	"""Returns the pct-th percentile (nearest rank) of a list of numbers."""
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	rank = math.ceil(pct / 100 * len(ordered)) - 1
+	return ordered[min(max(rank, 0), len(ordered) - 1)]